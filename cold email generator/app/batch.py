@@ -0,0 +1,379 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import Counter, defaultdict
+
+from browser_pool import shutdown_browser_pool
+from chains import TONES, Chain
+from crawler import CrawlFrontier, Crawler, HostLimiter
+from dedup import get_duplicate_index
+from fetcher import close_http_client, fetch_page_async
+from llm_cache import get_llm_cache
+from llm_client import AsyncChain
+from metrics import get_tracer, start_metrics_server
+from page_cache import get_page_cache
+from parse_pool import ParsePool
+from portfolio import Portfolio
+from preprocessing import prepare_page
+from skill_matcher import SkillMatcher, build_vocabulary
+from utils import normalize_url
+
+# Headless batch mode: fetch → parse → extract → retrieve → write_mail for a list of
+# job URLs without Streamlit. Each job is written to the JSONL output as soon as its
+# email is ready; the output file doubles as the checkpoint for resuming a run.
+#
+#   python app/batch.py urls.txt -o results.jsonl
+#   cat urls.txt | python app/batch.py - -o results.jsonl --tone Friendly
+#   python app/batch.py careers.txt --crawl -o results.jsonl   # careers listing pages
+
+PORTFOLIO_TOP_K = 8  # Best-matching portfolio links offered to the email prompt
+MIN_LOCAL_SKILLS = 5  # High-confidence local skill matches needed to skip LLM skill extraction
+
+# URLs from a file (or stdin for "-"), skipping blanks, comments and duplicates
+def read_urls(source):
+    stream = sys.stdin if source == "-" else open(source, encoding="utf-8")
+    try:
+        urls = {}
+        for line in stream:
+            url = line.strip()
+            if url and not url.startswith("#"):
+                urls.setdefault(normalize_url(url), url)
+        return list(urls.values())
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+# Progress from a previous run: the normalized URLs already finished, and the roles
+# already written per URL. A URL whose last record is an error is not finished, so
+# resuming retries it; its roles written as "ok" are skipped instead of emitted again.
+def load_checkpoint(path):
+    last_status = {}
+    done_roles = defaultdict(set)
+    if path == "-" or not os.path.exists(path):
+        return set(), {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # Partial last line from an interrupted run
+            url = normalize_url(record["url"])
+            last_status[url] = record.get("status")
+            if record.get("status") == "ok":
+                done_roles[url].add(record.get("role", ""))
+    return {url for url, status in last_status.items() if status != "error"}, dict(done_roles)
+
+# One-line error description for the JSONL record
+def error_message(exc):
+    lines = str(exc).strip().splitlines()
+    return f"{type(exc).__name__}: {lines[0] if lines else ''}"
+
+# Async pipeline with one semaphore per stage, so slow browser fetches, CPU-bound
+# parsing and rate-limited LLM calls each run at their own bounded concurrency
+# (LLM concurrency and quotas are enforced by AsyncChain).
+class BatchPipeline:
+    def __init__(self, llm, portfolio, skill_matcher=None, page_cache=None, fetch_concurrency=8,
+                 parse_concurrency=None, parse_pool=None, dedup=None, host_limiter=None, tone="Formal", top_k=PORTFOLIO_TOP_K,
+                 max_wait=8.0, done_roles=None):
+        self.llm = llm
+        self.portfolio = portfolio
+        self.skill_matcher = skill_matcher
+        self.parse_pool = parse_pool  # ParsePool for multi-core parsing; threads otherwise
+        self.page_cache = page_cache
+        self.dedup = dedup  # DuplicateIndex: reuse extraction and emails of reposted jobs
+        self.host_limiter = host_limiter  # HostLimiter: per-host politeness for crawled URLs
+        self.tone = tone
+        self.top_k = top_k
+        self.max_wait = max_wait
+        self.done_roles = done_roles or {}  # Roles already written per URL (from load_checkpoint)
+        self.fetch_concurrency = fetch_concurrency
+        self._fetch = asyncio.Semaphore(fetch_concurrency)
+        self._parse = asyncio.Semaphore(parse_concurrency or os.cpu_count() or 1)
+        self.counts = Counter()  # URLs and jobs per outcome
+
+    async def fetch(self, url):
+        if self.host_limiter is None:
+            async with self._fetch:
+                return await fetch_page_async(url, max_wait=self.max_wait, cache=self.page_cache)
+        async with self.host_limiter.slot(url), self._fetch:
+            return await fetch_page_async(url, max_wait=self.max_wait, cache=self.page_cache, headers=self.host_limiter.headers)
+
+    async def parse(self, html):
+        if self.parse_pool is not None:
+            prepared = await self.parse_pool.prepare(html)
+        else:
+            async with self._parse:
+                prepared = await asyncio.to_thread(prepare_page, html, skill_matcher=self.skill_matcher)
+        # Measured where the parse ran (possibly a worker process), recorded here
+        self.llm.chain.tracer.record_timings(prepared["timings"])
+        return prepared
+
+    # Same extraction choice as the app: role/summary only when enough skills were
+    # matched locally with high confidence, otherwise the chain's combined or plain extraction
+    async def extract(self, prepared):
+        if len(prepared["confident_skills"]) >= MIN_LOCAL_SKILLS:
+            return await self.llm.extract_role_summary(prepared["cleaned_text"], prepared["local_skills"])
+        if self.llm.chain.combined_extraction:
+            return await self.llm.extract_and_summarize(prepared["cleaned_text"])
+        return await self.llm.extract_jobs(prepared["cleaned_text"])
+
+    # Earlier posting with the same canonical URL or near-identical text, or None
+    async def find_duplicate(self, url, prepared=None):
+        if self.dedup is None:
+            return None
+        with self.llm.chain.tracer.span("dedup", by="content" if prepared else "url") as attrs:
+            if prepared is None:
+                duplicate = self.dedup.lookup_url(url)
+            else:
+                duplicate = await asyncio.to_thread(self.dedup.lookup_text, prepared["posting_text"], prepared["title"])
+            attrs["hit"] = duplicate is not None
+        return duplicate
+
+    # Retrieval and email for one job. A duplicate posting's email is reused when one
+    # was already written for the same role and tone; new emails are stored for reuse.
+    async def compose(self, job, url, posting_id=None, reuse=False):
+        with self.llm.chain.tracer.span("retrieval", mode="lexical"):
+            links = [link["links"] for link in self.portfolio.query_links(job.get("skills", []), top_k=self.top_k)]
+        role = job.get("role", "")
+        email = self.dedup.get_email(posting_id, role, self.tone, url=url) if reuse else None
+        if email is None:
+            email = await self.llm.write_mail(job, links, url, tone=self.tone)
+            if posting_id is not None:
+                self.dedup.put_email(posting_id, role, self.tone, email, url=url)
+        return job, links, email
+
+    # Run one URL through every stage, calling `emit` once per finished job (or once
+    # with the failing stage when the URL cannot be processed)
+    async def process(self, url, emit):
+        start = time.perf_counter()
+        stage = "dedup"
+        fetch_info = None
+        try:
+            # A known URL skips the fetch; a known posting text skips extraction
+            duplicate = await self.find_duplicate(url)
+            if duplicate is None:
+                stage = "fetch"
+                fetched = await self.fetch(url)
+                fetch_info = {"tier": fetched.get("tier"), "cache": fetched.get("cache"), "elapsed": round(fetched.get("elapsed", 0.0), 2)}
+                stage = "parse"
+                prepared = await self.parse(fetched["content"])
+                stage = "dedup"
+                duplicate = await self.find_duplicate(url, prepared)
+            if duplicate is None:
+                stage = "extract"
+                jobs = await self.extract(prepared)
+        except Exception as e:
+            self.counts["error"] += 1
+            emit({"url": url, "status": "error", "stage": stage, "error": error_message(e)})
+            return
+
+        if duplicate is not None:
+            self.counts["duplicate"] += 1
+            self.dedup.add_alias(url, duplicate["id"])
+            posting_id = duplicate["id"]
+            jobs = [dict(job, url=url) for job in duplicate["jobs"]]
+        else:
+            if not jobs:
+                self.counts["no_jobs"] += 1
+                emit({"url": url, "status": "no_jobs", "elapsed": round(time.perf_counter() - start, 2)})
+                return
+            jobs = [dict(job, url=url, experience=prepared["experience"]) for job in jobs]
+            posting_id = self.dedup.add(url, prepared["posting_text"], jobs, prepared["title"]) if self.dedup is not None else None
+        dedup_info = None
+        if duplicate is not None:
+            dedup_info = {"of": duplicate["url"], "match": duplicate["match"], "similarity": duplicate["similarity"]}
+        # Jobs written by an earlier run of a partly failed URL are not emitted again
+        written = self.done_roles.get(normalize_url(url), set())
+        jobs = [job for job in jobs if job.get("role", "") not in written]
+
+        failed = {}  # role -> error
+
+        async def compose(job):
+            try:
+                return await self.compose(job, url, posting_id, reuse=duplicate is not None)
+            except Exception as e:
+                failed[job.get("role", "")] = error_message(e)
+
+        for task in asyncio.as_completed([compose(job) for job in jobs]):
+            result = await task
+            if result is None:
+                continue
+            job, links, email = result
+            self.counts["jobs"] += 1
+            emit({
+                "url": url,
+                "status": "ok",
+                "role": job.get("role", ""),
+                "experience": job.get("experience", ""),
+                "skills": job.get("skills", []),
+                "summary": job.get("summary", ""),
+                "links": links,
+                "tone": self.tone,
+                "email": email,
+                "fetch": fetch_info,
+                "duplicate": dedup_info,
+                "elapsed": round(time.perf_counter() - start, 2),
+            })
+        if failed:
+            # Recorded as an error naming the failed roles, so a resumed run retries only
+            # those (cached LLM calls make that cheap)
+            self.counts["error"] += 1
+            emit({
+                "url": url,
+                "status": "error",
+                "stage": "write_mail",
+                "roles": list(failed),
+                "error": "; ".join(f"{role}: {error}" for role, error in failed.items()),
+            })
+        else:
+            self.counts["ok"] += 1
+
+    # Feed URLs (a list, or an async iterable such as Crawler.job_urls) through a
+    # bounded queue to a fixed set of workers, so thousands of URLs never turn into
+    # thousands of pending tasks
+    async def run(self, urls, emit, workers=None):
+        workers = workers or self.fetch_concurrency * 2
+        queue = asyncio.Queue(maxsize=workers * 2)
+
+        async def worker():
+            while True:
+                url = await queue.get()
+                if url is None:
+                    return
+                await self.process(url, emit)
+
+        tasks = [asyncio.create_task(worker()) for _ in range(workers)]
+        if hasattr(urls, "__aiter__"):
+            async for url in urls:
+                await queue.put(url)
+        else:
+            for url in urls:
+                await queue.put(url)
+        for _ in tasks:
+            await queue.put(None)
+        await asyncio.gather(*tasks)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate outreach emails for a list of job URLs.")
+    parser.add_argument("input", help="File with one job URL per line, or - for stdin")
+    parser.add_argument("--crawl", action="store_true", help="Input URLs are careers listing pages: crawl them for job links")
+    parser.add_argument("-o", "--output", default="-", help="JSONL output (appended; also the resume checkpoint)")
+    parser.add_argument("--portfolio", default="app/resource/company_portfolio.csv", help="Portfolio CSV (Techstack, Links)")
+    parser.add_argument("--tone", default="Formal", choices=TONES, help="Email tone")
+    parser.add_argument("--fetch-concurrency", type=int, default=8, help="Pages fetched at once")
+    parser.add_argument("--parse-processes", type=int, default=None, help="Parse worker processes (default: CPU count; 0 parses in threads)")
+    parser.add_argument("--parse-queue", type=int, default=None, help="Fetched pages allowed to wait for a parse worker (default: 2 per process)")
+    parser.add_argument("--llm-concurrency", type=int, default=4, help="LLM calls in flight")
+    parser.add_argument("--max-wait", type=float, default=8.0, help="Browser readiness wait per page (seconds)")
+    parser.add_argument("--no-page-cache", action="store_true", help="Always fetch pages live")
+    parser.add_argument("--no-dedup", action="store_true", help="Process reposted and near-duplicate jobs from scratch")
+    parser.add_argument("--report", default=None, help="Write the run's JSON metrics report here")
+    parser.add_argument("--metrics-file", default=None, help="Write Prometheus text metrics here at the end of the run")
+    parser.add_argument("--metrics-port", type=int, default=None, help="Serve live Prometheus metrics on this port (/metrics)")
+    crawl = parser.add_argument_group("crawl mode")
+    crawl.add_argument("--crawl-state", default="cache/crawl.sqlite3", help="Frontier database (resumes interrupted crawls)")
+    crawl.add_argument("--max-listing-pages", type=int, default=50, help="Listing pages fetched per run, pagination included")
+    crawl.add_argument("--per-host-concurrency", type=int, default=2, help="Requests in flight per host")
+    crawl.add_argument("--crawl-delay", type=float, default=1.0, help="Minimum seconds between requests to a host (robots.txt Crawl-delay wins if larger)")
+    crawl.add_argument("--ignore-robots", action="store_true", help="Do not honour robots.txt")
+    crawl.add_argument("--recrawl", action="store_true", help="Fetch finished listing pages again to find new postings")
+    args = parser.parse_args(argv)
+
+    urls = read_urls(args.input)
+    done, done_roles = load_checkpoint(args.output)
+    frontier = None
+    if args.crawl:
+        frontier = CrawlFrontier(args.crawl_state)
+        if args.recrawl:
+            frontier.recrawl_listings()
+        pending = urls
+        print(f"🕸️ Crawling {len(urls)} listing pages (state {args.crawl_state}: {frontier.stats()})", file=sys.stderr)
+    else:
+        pending = [url for url in urls if normalize_url(url) not in done]
+        print(f"📋 {len(urls)} URLs, {len(urls) - len(pending)} already done, {len(pending)} to process", file=sys.stderr)
+        if not pending:
+            return 0
+
+    if args.metrics_port:
+        start_metrics_server(args.metrics_port)
+
+    # Chain retries are disabled so AsyncChain owns backoff and rate limiting
+    chain = Chain(prompt_mode="robust", cache=get_llm_cache(), combined_extraction=True, max_retries=0)
+    portfolio = Portfolio(file_path=args.portfolio)
+    out = sys.stdout if args.output == "-" else open(args.output, "a", encoding="utf-8")
+
+    # One JSON object per line, flushed immediately so an interrupted run keeps its progress
+    def emit(record):
+        out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        out.flush()
+        if frontier is not None:
+            frontier.mark(record["url"], "error" if record["status"] == "error" else "done", error=record.get("error"))
+
+    async def run():
+        vocabulary = build_vocabulary(portfolio.techstack_terms)
+        parse_pool = None
+        if args.parse_processes != 0:
+            parse_pool = ParsePool(workers=args.parse_processes, queue_size=args.parse_queue, vocabulary=vocabulary)
+        pipeline = BatchPipeline(
+            AsyncChain(chain, max_concurrency=args.llm_concurrency, per_model_concurrency=args.llm_concurrency),
+            portfolio,
+            skill_matcher=SkillMatcher(vocabulary),
+            page_cache=None if args.no_page_cache else get_page_cache(),
+            fetch_concurrency=args.fetch_concurrency,
+            parse_pool=parse_pool,
+            dedup=None if args.no_dedup else get_duplicate_index(),
+            tone=args.tone,
+            max_wait=args.max_wait,
+            done_roles=done_roles,
+        )
+        source = pending
+        if frontier is not None:
+            # The same limiter paces listing and job-page fetches per host
+            pipeline.host_limiter = HostLimiter(
+                concurrency=args.fetch_concurrency, per_host=args.per_host_concurrency,
+                delay=args.crawl_delay, respect_robots=not args.ignore_robots,
+            )
+            crawler = Crawler(frontier, pipeline.host_limiter, max_listing_pages=args.max_listing_pages, max_wait=args.max_wait)
+            source = crawler.job_urls(pending)
+        try:
+            await pipeline.run(source, emit)
+        finally:
+            await close_http_client()
+            if parse_pool is not None:
+                parse_pool.close()
+        return pipeline
+
+    start = time.perf_counter()
+    try:
+        pipeline = asyncio.run(run())
+    finally:
+        shutdown_browser_pool()
+        if out is not sys.stdout:
+            out.close()
+        # Written even for interrupted runs, so a partial run can still be diagnosed
+        tracer = get_tracer()
+        if args.report:
+            tracer.write_report(args.report)
+        if args.metrics_file:
+            tracer.write_prometheus(args.metrics_file)
+    elapsed = time.perf_counter() - start
+    stages = tracer.report(recent_spans=0)["stages"]
+    print("⏱️ " + ", ".join(f"{name} p50 {stats['p50']:.2f}s / p95 {stats['p95']:.2f}s" for name, stats in stages.items()), file=sys.stderr)
+    counts = pipeline.counts
+    processed = counts["ok"] + counts["no_jobs"] + counts["error"]
+    print(
+        f"✅ {counts['ok']} URLs ok ({counts['jobs']} emails, {counts['duplicate']} duplicates), {counts['no_jobs']} without jobs, "
+        f"{counts['error']} failed in {elapsed:.1f}s ({processed / max(elapsed, 1e-9) * 60:.0f} URLs/min)",
+        file=sys.stderr,
+    )
+    if frontier is not None:
+        print(f"🕸️ Crawl state: {frontier.stats()}", file=sys.stderr)
+    return 1 if counts["error"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
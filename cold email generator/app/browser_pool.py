@@ -0,0 +1,162 @@
+import asyncio
+import atexit
+import threading
+from playwright.async_api import async_playwright, Error as PlaywrightError
+
+# Shared, long-lived Chromium pool. The browser is launched once per process on a
+# dedicated event-loop thread, so callers on any loop (Streamlit reruns, batch jobs)
+# reuse the same warm browser instead of paying the cold-start cost per URL.
+class BrowserPool:
+    def __init__(self, max_pages=4, max_navigations_per_context=50, headless=True, launch_args=None):
+        self.max_pages = max_pages  # Cap on concurrently open pages
+        self.max_navigations_per_context = max_navigations_per_context  # Recycle contexts after N uses
+        self.headless = headless
+        self.launch_args = launch_args or []
+        self._loop = None
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self._playwright = None
+        self._browser = None
+        self._browser_lock = None
+        self._semaphore = None
+        self._idle_contexts = []  # (context, navigations) pairs ready for reuse
+        self._closed = False
+
+    # --- Event loop management ---
+
+    # Start the pool's private event loop on a daemon thread (once)
+    def _ensure_loop(self):
+        with self._thread_lock:
+            if self._closed:
+                raise RuntimeError("Browser pool has been shut down.")
+            if self._loop is not None:
+                return
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self._loop.run_forever, name="browser-pool", daemon=True)
+            self._thread.start()
+
+    # Launch (or relaunch after a crash) the shared Chromium instance
+    async def _ensure_browser(self):
+        if self._browser_lock is None:
+            self._browser_lock = asyncio.Lock()
+            self._semaphore = asyncio.Semaphore(self.max_pages)
+        async with self._browser_lock:
+            if self._browser is not None and self._browser.is_connected():
+                return
+            # Browser died: every pooled context went with it
+            self._idle_contexts.clear()
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+            self._browser = await self._playwright.chromium.launch(headless=self.headless, args=self.launch_args)
+
+    # --- Context checkout / recycling ---
+
+    async def _acquire_context(self):
+        while self._idle_contexts:
+            context, navigations = self._idle_contexts.pop()
+            if navigations < self.max_navigations_per_context:
+                return context, navigations
+            await self._close_context(context)
+        return await self._browser.new_context(), 0
+
+    async def _release_context(self, context, navigations, healthy):
+        # Discard contexts that crashed or reached their navigation budget
+        if healthy and navigations < self.max_navigations_per_context and self._browser.is_connected():
+            self._idle_contexts.append((context, navigations))
+        else:
+            await self._close_context(context)
+
+    @staticmethod
+    async def _close_context(context):
+        try:
+            await context.close()
+        except PlaywrightError:
+            pass  # Already gone with a crashed browser
+
+    async def _run_on_page(self, fn):
+        await self._ensure_browser()
+        async with self._semaphore:
+            context, navigations = await self._acquire_context()
+            healthy = True
+            page = None
+            try:
+                page = await context.new_page()
+                return await fn(page)
+            except PlaywrightError:
+                # Target/page crashes surface as Playwright errors; don't reuse the context
+                healthy = False
+                raise
+            finally:
+                if page is not None:
+                    try:
+                        await page.close()
+                    except PlaywrightError:
+                        healthy = False
+                await self._release_context(context, navigations + 1, healthy)
+
+    # --- Public API ---
+
+    # Run `fn(page)` on a pooled page; awaitable from any event loop
+    async def run(self, fn):
+        self._ensure_loop()
+        future = asyncio.run_coroutine_threadsafe(self._run_on_page(fn), self._loop)
+        return await asyncio.wrap_future(future)
+
+    # Blocking variant for synchronous callers
+    def run_sync(self, fn, timeout=None):
+        self._ensure_loop()
+        future = asyncio.run_coroutine_threadsafe(self._run_on_page(fn), self._loop)
+        return future.result(timeout)
+
+    async def _shutdown(self):
+        for context, _ in self._idle_contexts:
+            await self._close_context(context)
+        self._idle_contexts.clear()
+        if self._browser is not None:
+            try:
+                await self._browser.close()
+            except PlaywrightError:
+                pass
+            self._browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    # Close contexts, browser and Playwright driver, then stop the loop thread
+    def close(self, timeout=30):
+        with self._thread_lock:
+            if self._closed:
+                return
+            self._closed = True
+            loop, thread = self._loop, self._thread
+        if loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), loop).result(timeout)
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join(timeout)
+            loop.close()
+
+
+# --- Process-wide pool ---
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# Return the shared pool, creating it on first use (kwargs only apply then)
+def get_browser_pool(**kwargs):
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool(**kwargs)
+            atexit.register(_pool.close)
+        return _pool
+
+# Shut down the shared pool (e.g., at the end of a batch run)
+def shutdown_browser_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.close()
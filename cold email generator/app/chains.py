@@ -1,23 +1,273 @@
 import os
-import streamlit as st
+from concurrent.futures import ThreadPoolExecutor
 from langchain_groq import ChatGroq
 from langchain_core.prompts import PromptTemplate, ChatPromptTemplate
 from langchain_core.output_parsers import JsonOutputParser
 from langchain_core.exceptions import OutputParserException
 from dotenv import load_dotenv
 
+from metrics import get_tracer
+from utils import estimate_tokens, split_into_chunks, CHARS_PER_TOKEN
+
 # Load environment variables from .env file (e.g., GROQ_API_KEY)
 load_dotenv()
 
+# Methods whose responses are cached by default. Emails (write_mail, stream_mail and
+# write_mail_variants) are keyed on the job, portfolio links, URL and tone; Regenerate
+# passes bypass_cache for a fresh draft, which then replaces the cached one.
+DEFAULT_CACHED_METHODS = ("extract_jobs", "summarize", "extract_and_summarize", "extract_role_summary", "write_mail")
+
+# Pipeline stage each traced Chain method belongs to
+STAGE_FOR_METHOD = {
+    "extract_jobs": "extract",
+    "extract_and_summarize": "extract",
+    "extract_role_summary": "extract",
+    "summarize": "summarize",
+    "write_mail": "write_mail",
+}
+
+# (prompt, completion) tokens from the provider's usage metadata, else estimated
+def token_usage(message, prompt, variables):
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    return estimate_tokens(prompt.format(**variables)), estimate_tokens(message.content)
+
+# Prompt for the short job preview (summarize / stream_summary)
+SUMMARY_TEMPLATE = """
+            ### CONTEXT:
+            {text}
+
+            ### INSTRUCTION:
+            Summarize the job description above in under {max_words} words.
+            Focus on the core responsibilities and the overall goal of the role.
+            Output only the summary. Do not prefix it with 'Summary:' or any other label.
+            """
+
+# Prompt for the cold outreach email (write_mail / stream_mail)
+EMAIL_TEMPLATE = """
+               ### JOB DESCRIPTION:
+               {job_description}
+    
+               ### JOB LINK:
+               {job_url}
+    
+               ### TONE:
+               Write the email in a {tone} tone: {tone_guidance}
+    
+               ### INSTRUCTION:
+               You are Karthik Mohan, a business development executive at Tata Consultancy Services. Tata Consultancy Services (TCS) is an AI & Software Consulting company that helps global enterprises build secure, scalable, and intelligent systems across domains.
+    
+               Your job is to write a personalized cold email to the client regarding the job mentioned above. Highlight how TCS can support the technical goals of the position through our proven capabilities.
+    
+               Focus on:
+               - How our engineering teams, domain experts, and cross-functional consultants align with the technical demands of the role.
+               - Specific types of projects we’ve delivered in areas like cloud platforms, scalable architectures, DevOps, cybersecurity, and AI.
+               - Relevant accomplishments that demonstrate the value we bring to similar roles/teams.
+    
+               Reference **up to 4 most relevant portfolio links** from the list provided in {link_list}. Do not present them as a bullet list — weave them naturally into the explanation.
+    
+               Include the job link explicitly in the email body.
+    
+               End the email with this signature, each on a new line:
+               Karthik Mohan  
+               Business Development Executive  
+               Tata Consultancy Services
+    
+               Avoid generic phrases or long intros. Do not include any job requirements or candidate qualifications.
+               Do not add any preamble before the email starts.
+    
+               ### EMAIL (NO PREAMBLE):
+               """
+
+# Email tones offered in the UI and how each should read
+TONE_GUIDANCE = {
+    "Formal": "professional and polished, with complete sentences and no slang.",
+    "Friendly": "warm and conversational, approachable but still professional.",
+    "Concise": "brief and to the point; keep the body under 120 words.",
+    "Technical": "precise and engineering-focused, naming concrete technologies, architectures and practices.",
+}
+TONES = list(TONE_GUIDANCE)
+
+# Expected shape of one job from the combined extraction: key -> (type, default)
+JOB_SCHEMA = {
+    "role": (str, ""),
+    "experience": (str, ""),
+    "skills": (list, []),
+    "description": (str, ""),
+    "summary": (str, ""),
+}
+
+# Validate one extracted job against JOB_SCHEMA. Missing keys get their default,
+# comma-separated skill strings become lists, anything else wrong is rejected.
+def validate_job(job):
+    if not isinstance(job, dict):
+        raise OutputParserException(f"Expected a JSON object per job, got {type(job).__name__}.")
+    validated = {}
+    for key, (expected_type, default) in JOB_SCHEMA.items():
+        value = job.get(key)
+        if value is None:
+            value = type(default)(default)
+        elif key == "skills" and isinstance(value, str):
+            value = [s.strip() for s in value.split(",") if s.strip()]
+        elif key == "experience" and isinstance(value, (int, float)):
+            value = str(value)
+        if not isinstance(value, expected_type):
+            raise OutputParserException(f"Field '{key}' should be {expected_type.__name__}, got {type(value).__name__}.")
+        validated[key] = value
+    validated["skills"] = [str(s).strip() for s in validated["skills"] if str(s).strip()]
+    return validated
+
+# Merge per-chunk extractions, de-duplicating jobs by role: skills are unioned in
+# order of appearance and the longest description/summary wins
+def merge_jobs(partials):
+    merged = {}
+    for job in partials:
+        if not isinstance(job, dict):
+            continue
+        key = str(job.get("role") or "").strip().lower()
+        if key not in merged:
+            merged[key] = dict(job, skills=list(job.get("skills") or []))
+            continue
+        target = merged[key]
+        for skill in job.get("skills") or []:
+            if skill not in target["skills"]:
+                target["skills"].append(skill)
+        for field in ("description", "summary"):
+            if len(str(job.get(field) or "")) > len(str(target.get(field) or "")):
+                target[field] = job[field]
+        if not target.get("experience") and job.get("experience"):
+            target["experience"] = job["experience"]
+    # Drop the role-less bucket when real roles were found
+    if len(merged) > 1:
+        merged.pop("", None)
+    return list(merged.values())
+
 class Chain:
-    def __init__(self, prompt_mode="default"):
+    def __init__(self, prompt_mode="default", cache=None, cached_methods=DEFAULT_CACHED_METHODS, combined_extraction=False,
+                 base_url=None, max_retries=2, max_page_tokens=4000, chunk_tokens=3000, chunk_overlap_tokens=200,
+                 max_parallel_chunks=4, tracer=None, llm=None):
         # Set prompt mode: 'default' or 'robust'
         self.prompt_mode = prompt_mode
+        # Extract and summarize in one LLM call (see extract_and_summarize)
+        self.combined_extraction = combined_extraction
         # Initialize LLM (Groq with LLaMA 3.1 model)
-        self.llm = ChatGroq(temperature=0.8, model="llama-3.1-8b-instant")
+        self.model_name = "llama-3.1-8b-instant"
+        self.temperature = 0.8
+        # base_url points the client at a stand-in server for testing (also read from GROQ_BASE_URL);
+        # set max_retries=0 when AsyncChain owns retries and backoff. `llm` injects another
+        # chat model instead (e.g., the deterministic fake used by the offline benchmarks).
+        if llm is None:
+            llm_kwargs = {"base_url": base_url} if base_url else {}
+            llm = ChatGroq(temperature=self.temperature, model=self.model_name, max_retries=max_retries, **llm_kwargs)
+        self.llm = llm
         self.chat_model = self.llm  # Used for summarization as well
+        # Optional LLMCache and the methods that opt in to it
+        self.cache = cache
+        self.cached_methods = set(cached_methods or ())
+        # Token budget: pages above max_page_tokens are extracted chunk-by-chunk in parallel
+        self.max_page_tokens = max_page_tokens
+        self.chunk_tokens = chunk_tokens
+        self.chunk_overlap_tokens = chunk_overlap_tokens
+        self.max_parallel_chunks = max_parallel_chunks
+        # Spans, token counts and cache hits for every LLM call (metrics.Tracer)
+        self.tracer = tracer or get_tracer()
+
+    # Run `prompt | model` with the response cache in front of it. `parse` (if given)
+    # validates the text before it is stored, so unparseable output is never cached.
+    # `bypass_cache` forces a fresh call (e.g., regeneration) and overwrites the entry.
+    # Each call is traced as a span of its stage with tokens and the cache result.
+    def _invoke(self, method, prompt, template, variables, model=None, parse=None, bypass_cache=False):
+        model = model or self.llm
+        parse = parse or (lambda text: text)
+        cache = self.cache if method in self.cached_methods else None
+        with self.tracer.span(STAGE_FOR_METHOD.get(method, method), method=method, cache="off") as span:
+            key = cache.make_key(self.model_name, self.temperature, template, variables) if cache else None
+            if cache is not None and not bypass_cache:
+                cached = cache.get(key, method)
+                if cached is not None:
+                    span["cache"] = "hit"
+                    self.tracer.record_llm_call(method, cache="hit")
+                    return parse(cached)
+            message = (prompt | model).invoke(variables)
+            prompt_tokens, completion_tokens = token_usage(message, prompt, variables)
+            span.update(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+            self.tracer.record_llm_call(method, prompt_tokens, completion_tokens, cache="off" if cache is None else "miss")
+            result = parse(message.content)
+            if cache is not None:
+                span["cache"] = "miss"
+                cache.put(key, method, self.model_name, message.content)
+            return result
+
+    # Streaming counterpart of _invoke: yields chunks as the model produces them and
+    # stores the full text in the response cache once the stream completes. A cache
+    # hit is yielded as a single chunk.
+    def _stream(self, method, prompt, template, variables, model=None, bypass_cache=False):
+        model = model or self.llm
+        cache = self.cache if method in self.cached_methods else None
+        key = cache.make_key(self.model_name, self.temperature, template, variables) if cache else None
+        with self.tracer.span(STAGE_FOR_METHOD.get(method, method), method=method, cache="off", stream=True) as span:
+            if cache is not None and not bypass_cache:
+                cached = cache.get(key, method)
+                if cached is not None:
+                    span["cache"] = "hit"
+                    self.tracer.record_llm_call(method, cache="hit")
+                    yield cached
+                    return
+            message = None
+            for chunk in (prompt | model).stream(variables):
+                message = chunk if message is None else message + chunk
+                yield chunk.content
+            if message is None:
+                return
+            prompt_tokens, completion_tokens = token_usage(message, prompt, variables)
+            span.update(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+            self.tracer.record_llm_call(method, prompt_tokens, completion_tokens, cache="off" if cache is None else "miss")
+            if cache is not None:
+                span["cache"] = "miss"
+                cache.put(key, method, self.model_name, message.content)
+
+    # Token-counting preflight: the page itself when within max_page_tokens, else
+    # overlapping chunks for map-reduce extraction
+    def page_chunks(self, cleaned_text):
+        if estimate_tokens(cleaned_text) <= self.max_page_tokens:
+            return [cleaned_text]
+        return split_into_chunks(cleaned_text, self.chunk_tokens, self.chunk_overlap_tokens)
+
+    # Merge the per-chunk job lists by role; None marks a chunk that failed to parse
+    def reduce_chunk_jobs(self, results):
+        partials = [job for jobs in results if jobs for job in jobs]
+        if not partials:
+            raise OutputParserException("Unable to parse jobs from any chunk.")
+        return merge_jobs(partials)
+
+    # Pages within budget go through `extract_chunk` in one call; larger pages are
+    # split into chunks extracted in parallel and merged. The fan-out is traced as a
+    # "map_reduce" span alongside the per-chunk LLM spans.
+    def _map_reduce_extract(self, extract_chunk, cleaned_text):
+        chunks = self.page_chunks(cleaned_text)
+        if len(chunks) == 1:
+            return extract_chunk(cleaned_text)
+
+        def run_chunk(index_chunk):
+            index, chunk = index_chunk
+            try:
+                return extract_chunk(chunk)
+            except OutputParserException as e:
+                print(f"⚠️ Skipping chunk {index} due to parsing error: {e}")
+                return None
+
+        with self.tracer.span("map_reduce", chunks=len(chunks), tokens=estimate_tokens(cleaned_text)):
+            with ThreadPoolExecutor(max_workers=self.max_parallel_chunks) as pool:
+                results = list(pool.map(run_chunk, enumerate(chunks)))
+            return self.reduce_chunk_jobs(results)
 
-    def extract_jobs(self, cleaned_text):
+    def extract_jobs(self, cleaned_text, bypass_cache=False):
+        return self._map_reduce_extract(
+            lambda chunk: self.extract_jobs_chunk(chunk, bypass_cache=bypass_cache), cleaned_text
+        )
+
+    def extract_jobs_chunk(self, cleaned_text, bypass_cache=False):
         # Use robust or default prompt based on mode
         if self.prompt_mode == "robust":
             prompt_text = """
@@ -52,84 +302,187 @@ class Chain:
             ### VALID JSON (NO PREAMBLE):
             """
 
-        # Create prompt and pass it to the LLM chain
+        def parse_jobs(content):
+            try:
+                # Attempt to parse JSON output
+                json_parser = JsonOutputParser()
+                parsed = json_parser.parse(content)
+                return parsed if isinstance(parsed, list) else [parsed]
+            except Exception as e:
+                # Handle JSON parsing failures gracefully
+                print(f"⚠️ Parsing failed due to size or formatting: {e}")
+                raise OutputParserException("Context too big. Unable to parse jobs.")
+
+        # Create prompt and pass it to the LLM chain (through the response cache)
         prompt_extract = PromptTemplate.from_template(prompt_text)
-        chain_extract = prompt_extract | self.llm
-        res = chain_extract.invoke(input={"page_data": cleaned_text})
-
-        try:
-            # Attempt to parse JSON output
-            json_parser = JsonOutputParser()
-            parsed = json_parser.parse(res.content)
-            return parsed if isinstance(parsed, list) else [parsed]
-        except Exception as e:
-            # Handle JSON parsing failures gracefully
-            st.warning(f"⚠️ Skipping a chunk due to parsing error: {e}")
-            print("⚠️ Parsing failed due to size or formatting.")
-            raise OutputParserException("Context too big. Unable to parse jobs.")
-
-    def summarize(self, text, max_words=60):
-        # Create summarization prompt (e.g., for job preview)
-        prompt_template = ChatPromptTemplate.from_template(
+        return self._invoke(
+            "extract_jobs", prompt_extract, prompt_text, {"page_data": cleaned_text},
+            parse=parse_jobs, bypass_cache=bypass_cache,
+        )
+
+    # Single structured call returning role, experience, skills, description and a
+    # short summary per job, so the page is sent to the model once instead of
+    # once for extraction plus once per job for summarization.
+    def extract_and_summarize(self, cleaned_text, max_words=60, bypass_cache=False):
+        return self._map_reduce_extract(
+            lambda chunk: self.extract_and_summarize_chunk(chunk, max_words, bypass_cache=bypass_cache), cleaned_text
+        )
+
+    def extract_and_summarize_chunk(self, cleaned_text, max_words=60, bypass_cache=False):
+        prompt_text = """
+            ### SCRAPED TEXT FROM WEBSITE:
+            {page_data}
+            ### INSTRUCTION:
+            The scraped text is from a job posting page. Extract only the job that is clearly described on this page and return it in this exact JSON format:
+
+            {{
+              "role": "...",
+              "experience": "...",
+              "skills": ["...", "..."],
+              "description": "Summarize the job responsibilities in 4–6 sentences, covering the core responsibilities, the purpose of the role, and the team or product this role supports.",
+              "summary": "A preview of the job in under {max_words} words, focused on the core responsibilities and the overall goal of the role."
+            }}
+
+            - Always extract a `role`, even if it needs to be inferred.
+            - `skills` must include technical tools, languages, or platforms, especially those mentioned in Qualifications or Responsibilities.
+            - If a field is missing, leave it as an empty string or empty list, but DO NOT omit the key.
+            Output clean, **valid JSON** only.
+            ### VALID JSON (NO PREAMBLE):
             """
-            ### CONTEXT:
-            {text}
 
+        def parse_jobs(content):
+            try:
+                parsed = JsonOutputParser().parse(content)
+            except Exception as e:
+                raise OutputParserException(f"Unable to parse combined extraction: {e}")
+            return [validate_job(job) for job in (parsed if isinstance(parsed, list) else [parsed])]
+
+        prompt_extract = PromptTemplate.from_template(prompt_text)
+        return self._invoke(
+            "extract_and_summarize", prompt_extract, prompt_text,
+            {"page_data": cleaned_text, "max_words": max_words},
+            parse=parse_jobs, bypass_cache=bypass_cache,
+        )
+
+    # Shrunk extraction for when skills were already found locally (skill_matcher):
+    # asks only for role, experience, description and summary over the first
+    # `max_tokens` of the page, and attaches the given skills to each job.
+    def extract_role_summary(self, cleaned_text, skills, max_words=60, max_tokens=1500, bypass_cache=False):
+        prompt_text = """
+            ### SCRAPED TEXT FROM WEBSITE:
+            {page_data}
             ### INSTRUCTION:
-            Summarize the job description above in under {max_words} words.
-            Focus on the core responsibilities and the overall goal of the role.
-            Output only the summary. Do not prefix it with 'Summary:' or any other label.
+            The scraped text is from a job posting page. Extract only the job that is clearly described on this page and return it in this exact JSON format:
+
+            {{
+              "role": "...",
+              "experience": "...",
+              "description": "Summarize the job responsibilities in 4–6 sentences, covering the core responsibilities, the purpose of the role, and the team or product this role supports.",
+              "summary": "A preview of the job in under {max_words} words, focused on the core responsibilities and the overall goal of the role."
+            }}
+
+            - Always extract a `role`, even if it needs to be inferred.
+            - If a field is missing, leave it as an empty string, but DO NOT omit the key.
+            Output clean, **valid JSON** only.
+            ### VALID JSON (NO PREAMBLE):
             """
+
+        def parse_jobs(content):
+            try:
+                parsed = JsonOutputParser().parse(content)
+            except Exception as e:
+                raise OutputParserException(f"Unable to parse role extraction: {e}")
+            jobs = [validate_job(job) for job in (parsed if isinstance(parsed, list) else [parsed])]
+            for job in jobs:
+                job["skills"] = list(skills)
+            return jobs
+
+        prompt_extract = PromptTemplate.from_template(prompt_text)
+        return self._invoke(
+            "extract_role_summary", prompt_extract, prompt_text,
+            {"page_data": cleaned_text[:max_tokens * CHARS_PER_TOKEN], "max_words": max_words},
+            parse=parse_jobs, bypass_cache=bypass_cache,
         )
+
+    def summarize(self, text, max_words=60, bypass_cache=False):
+        # Create summarization prompt (e.g., for job preview)
+        prompt_template = ChatPromptTemplate.from_template(SUMMARY_TEMPLATE)
         # Run summarization chain
-        chain_summary = prompt_template | self.chat_model
-        result = chain_summary.invoke({"text": text.strip(), "max_words": max_words})
-        return result.content.strip()
+        result = self._invoke(
+            "summarize", prompt_template, SUMMARY_TEMPLATE, {"text": text.strip(), "max_words": max_words},
+            model=self.chat_model, bypass_cache=bypass_cache,
+        )
+        return result.strip()
 
-    def write_mail(self, job, links, job_url=None, tone="Formal"):
-        # Create the prompt for cold outreach email
-        prompt_email = PromptTemplate.from_template(
-            """
-               ### JOB DESCRIPTION:
-               {job_description}
-    
-               ### JOB LINK:
-               {job_url}
-    
-               ### INSTRUCTION:
-               You are Karthik Mohan, a business development executive at Tata Consultancy Services. Tata Consultancy Services (TCS) is an AI & Software Consulting company that helps global enterprises build secure, scalable, and intelligent systems across domains.
-    
-               Your job is to write a personalized cold email to the client regarding the job mentioned above. Highlight how TCS can support the technical goals of the position through our proven capabilities.
-    
-               Focus on:
-               - How our engineering teams, domain experts, and cross-functional consultants align with the technical demands of the role.
-               - Specific types of projects we’ve delivered in areas like cloud platforms, scalable architectures, DevOps, cybersecurity, and AI.
-               - Relevant accomplishments that demonstrate the value we bring to similar roles/teams.
-    
-               Reference **up to 4 most relevant portfolio links** from the list provided in {link_list}. Do not present them as a bullet list — weave them naturally into the explanation.
-    
-               Include the job link explicitly in the email body.
-    
-               End the email with this signature, each on a new line:
-               Karthik Mohan  
-               Business Development Executive  
-               Tata Consultancy Services
-    
-               Avoid generic phrases or long intros. Do not include any job requirements or candidate qualifications.
-               Do not add any preamble before the email starts.
-    
-               ### EMAIL (NO PREAMBLE):
-               """
+    # Streaming variant of summarize: yields text chunks as they arrive
+    def stream_summary(self, text, max_words=60, bypass_cache=False):
+        prompt_template = ChatPromptTemplate.from_template(SUMMARY_TEMPLATE)
+        yield from self._stream(
+            "summarize", prompt_template, SUMMARY_TEMPLATE, {"text": text.strip(), "max_words": max_words},
+            model=self.chat_model, bypass_cache=bypass_cache,
         )
-        # Run email generation chain
-        chain_email = prompt_email | self.llm
-        res = chain_email.invoke({
+
+    @staticmethod
+    def _mail_variables(job, links, job_url, tone):
+        return {
             "job_description": job.get("description", ""),
             "link_list": links,
             "job_url": job_url or "Not Provided",
-            "tone": tone
-        })
-        return res.content
+            "tone": tone,
+            "tone_guidance": TONE_GUIDANCE.get(tone, "clear and professional."),
+        }
+
+    def write_mail(self, job, links, job_url=None, tone="Formal", bypass_cache=False):
+        # Create the prompt for cold outreach email
+        prompt_email = PromptTemplate.from_template(EMAIL_TEMPLATE)
+        # Run email generation chain (cached while write_mail is in cached_methods)
+        return self._invoke(
+            "write_mail", prompt_email, EMAIL_TEMPLATE, self._mail_variables(job, links, job_url, tone),
+            bypass_cache=bypass_cache,
+        )
+
+    # Streaming variant of write_mail: yields text chunks as they arrive
+    def stream_mail(self, job, links, job_url=None, tone="Formal", bypass_cache=False):
+        prompt_email = PromptTemplate.from_template(EMAIL_TEMPLATE)
+        yield from self._stream(
+            "write_mail", prompt_email, EMAIL_TEMPLATE, self._mail_variables(job, links, job_url, tone),
+            bypass_cache=bypass_cache,
+        )
+
+    # Generate the email in several tones at once through the chain's batch API
+    # (at most `max_concurrency` calls in flight). Yields (tone, email) as each
+    # variant completes; cached variants are yielded first without an LLM call.
+    def write_mail_variants(self, job, links, job_url=None, tones=TONES, max_concurrency=4, bypass_cache=False):
+        cache = self.cache if "write_mail" in self.cached_methods else None
+        pending = []
+        for tone in tones:
+            variables = self._mail_variables(job, links, job_url, tone)
+            key = cache.make_key(self.model_name, self.temperature, EMAIL_TEMPLATE, variables) if cache else None
+            cached = cache.get(key, "write_mail") if cache is not None and not bypass_cache else None
+            if cached is not None:
+                self.tracer.record_llm_call("write_mail", cache="hit")
+                yield tone, cached
+            else:
+                pending.append((tone, variables, key))
+        if not pending:
+            return
+
+        prompt_email = PromptTemplate.from_template(EMAIL_TEMPLATE)
+        chain_email = prompt_email | self.llm
+        results = chain_email.batch_as_completed(
+            [variables for _, variables, _ in pending],
+            config={"max_concurrency": max_concurrency},
+            return_exceptions=True,
+        )
+        for index, res in results:
+            tone, variables, key = pending[index]
+            if isinstance(res, Exception):
+                print(f"⚠️ Email generation failed for tone '{tone}': {res}")
+                continue
+            self.tracer.record_llm_call("write_mail", *token_usage(res, prompt_email, variables), cache="off" if cache is None else "miss")
+            if cache is not None:
+                cache.put(key, "write_mail", self.model_name, res.content)
+            yield tone, res.content
 
 # Debug/test entry point
 if __name__ == "__main__":
@@ -0,0 +1,324 @@
+import asyncio
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import asynccontextmanager
+from urllib.parse import urljoin, urlsplit
+from urllib.robotparser import RobotFileParser
+import httpx
+
+from fetcher import DEFAULT_HEADERS, fetch_rendered_async, fetch_static_async, get_http_client
+from metrics import get_tracer
+from parsing import parse_html
+from utils import canonical_job_url
+
+# Careers-listing crawler: starts from listing pages (a company's careers index),
+# discovers job-detail links and pagination, and hands job URLs to the batch
+# pipeline as they are found. Fetches are polite (robots.txt, per-host spacing and
+# concurrency) and the frontier lives in SQLite, so an interrupted crawl resumes
+# without refetching what it already finished.
+
+# Token matched against robots.txt User-agent lines ("*" rules apply otherwise); crawl
+# requests identify themselves with it instead of the browser-like default User-Agent
+CRAWLER_AGENT = "OutreachCrawler"
+
+# Attempts per URL before it is given up as failed
+MAX_ATTEMPTS = 3
+
+# Link heuristics: a job-detail link is an ATS posting, carries a job-id query
+# parameter, or sits under a jobs/careers-like path and ends in a posting slug
+JOB_PATH_RE = re.compile(
+    r"/(?:jobs?|careers?|positions?|openings?|vacanc(?:y|ies)|postings?|opportunities|requisitions?|job-details?)/", re.IGNORECASE
+)
+JOB_QUERY_RE = re.compile(r"(?:^|&)(?:gh_jid|jobid|job_id|jid|reqid|req_id|posting_id)=", re.IGNORECASE)
+POSTING_SLUG_RE = re.compile(r"\d|[a-z]+[-_][a-z]+", re.IGNORECASE)
+NEXT_TEXT_RE = re.compile(r"^\s*(?:next(?: page)?|more jobs|load more|show more|›|»|→|>)\s*$", re.IGNORECASE)
+PAGE_PARAM_RE = re.compile(r"(?:^|&)(?:page|p|pg|offset|start)=\d+", re.IGNORECASE)
+PAGE_PATH_RE = re.compile(r"/page/\d+/?$", re.IGNORECASE)
+SKIP_EXTENSIONS_RE = re.compile(r"\.(?:pdf|jpe?g|png|gif|svg|zip|docx?|css|js|xml|ics|rss)$", re.IGNORECASE)
+
+# Last two host labels, so careers.example.com and example.com count as one site
+def site_of(host):
+    return ".".join(host.lower().removeprefix("www.").split(".")[-2:])
+
+def is_job_link(url, listing_url):
+    parts, listing = urlsplit(url), urlsplit(listing_url)
+    if canonical_job_url(url).startswith("ats://"):
+        return True  # ATS postings are followed across hosts
+    if site_of(parts.netloc) != site_of(listing.netloc):
+        return False
+    if JOB_QUERY_RE.search(parts.query):
+        return True
+    path = parts.path.rstrip("/")
+    if not JOB_PATH_RE.search(path + "/") or listing.path.rstrip("/").startswith(path):
+        return False
+    return bool(POSTING_SLUG_RE.search(path.rsplit("/", 1)[-1]))
+
+def is_pagination_link(url, anchor, listing_url):
+    parts, listing = urlsplit(url), urlsplit(listing_url)
+    if site_of(parts.netloc) != site_of(listing.netloc):
+        return False
+    return (
+        "next" in (anchor.get("rel") or [])
+        or bool(NEXT_TEXT_RE.match(anchor.get_text(" ", strip=True)))
+        or bool(PAGE_PATH_RE.search(parts.path))
+        or (parts.path.rstrip("/") == listing.path.rstrip("/") and bool(PAGE_PARAM_RE.search(parts.query)))
+    )
+
+# Job-detail links and further listing pages (pagination) found on a listing page.
+# Pagination is checked first: "/careers/page/3" would otherwise pass as a posting slug.
+def discover_links(html, listing_url):
+    soup = parse_html(html)
+    jobs, listings = {}, {}
+    for anchor in soup.find_all("a", href=True):
+        href = anchor["href"].strip()
+        if not href or href.startswith(("#", "mailto:", "tel:", "javascript:")):
+            continue
+        url = urljoin(listing_url, href).split("#", 1)[0]
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or SKIP_EXTENSIONS_RE.search(parts.path):
+            continue
+        if is_pagination_link(url, anchor, listing_url):
+            listings.setdefault(canonical_job_url(url), url)
+        elif is_job_link(url, listing_url):
+            jobs.setdefault(canonical_job_url(url), url)
+    listings.pop(canonical_job_url(listing_url), None)
+    return {"jobs": list(jobs.values()), "listings": list(listings.values())}
+
+
+# --- Politeness ---
+
+# Bounded global and per-host fetch concurrency with a minimum spacing between
+# requests to the same host (the larger of `delay` and the host's robots.txt
+# Crawl-delay). robots.txt is fetched once per host; a missing file (4xx) allows
+# everything, an unreachable one (5xx, network error) disallows the host (RFC 9309).
+class HostLimiter:
+    def __init__(self, concurrency=8, per_host=2, delay=1.0, respect_robots=True, user_agent=CRAWLER_AGENT):
+        self.per_host = per_host
+        self.delay = delay
+        self.respect_robots = respect_robots
+        self.user_agent = user_agent
+        # Request headers for everything fetched under this limiter, robots.txt included
+        self.headers = {**DEFAULT_HEADERS, "User-Agent": f"Mozilla/5.0 (compatible; {user_agent}/1.0)"}
+        self._global = asyncio.Semaphore(concurrency)
+        self._hosts = {}  # host → {"semaphore", "next_at", "lock"}
+        self._robots = {}  # host → RobotFileParser (or a Task while it is being fetched)
+
+    def _host(self, host):
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = {"semaphore": asyncio.Semaphore(self.per_host), "next_at": 0.0, "lock": asyncio.Lock()}
+        return state
+
+    async def _load_robots(self, origin):
+        parser = RobotFileParser(f"{origin}/robots.txt")
+        try:
+            response = await get_http_client().get(parser.url, headers=self.headers)
+        except httpx.HTTPError:
+            parser.disallow_all = True
+            return parser
+        if response.status_code >= 500:
+            parser.disallow_all = True
+        elif response.status_code >= 400:
+            parser.allow_all = True
+        else:
+            parser.parse(response.text.splitlines())
+        parser.modified()  # can_fetch treats a never-read parser as "disallow"
+        return parser
+
+    async def robots(self, url):
+        parts = urlsplit(url)
+        robots = self._robots.get(parts.netloc)
+        if robots is None:
+            robots = self._robots[parts.netloc] = asyncio.ensure_future(self._load_robots(f"{parts.scheme}://{parts.netloc}"))
+        if isinstance(robots, asyncio.Future):
+            robots = self._robots[parts.netloc] = await robots
+        return robots
+
+    async def allowed(self, url):
+        if not self.respect_robots:
+            return True
+        return (await self.robots(url)).can_fetch(self.user_agent, url)
+
+    async def spacing(self, url):
+        crawl_delay = (await self.robots(url)).crawl_delay(self.user_agent) if self.respect_robots else None
+        return max(self.delay, float(crawl_delay or 0))
+
+    # Hold a global and a per-host slot for one request, starting it no sooner than
+    # the host's spacing after the previous request to that host
+    @asynccontextmanager
+    async def slot(self, url):
+        host = self._host(urlsplit(url).netloc)
+        spacing = await self.spacing(url)
+        async with host["semaphore"]:
+            async with host["lock"]:
+                wait = host["next_at"] - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                host["next_at"] = time.monotonic() + spacing
+            async with self._global:
+                yield
+
+
+# --- Persistent frontier ---
+
+# Crawl state in SQLite: every discovered listing and job URL (keyed by its
+# canonical job URL) with its status — pending, done, failed or blocked (robots).
+# Errors leave a URL pending until it has used MAX_ATTEMPTS.
+class CrawlFrontier:
+    def __init__(self, path="cache/crawl.sqlite3", max_attempts=MAX_ATTEMPTS):
+        self.path = path
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS urls (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                status TEXT NOT NULL,
+                source TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                added_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS urls_pending ON urls (kind, status)")
+        self._conn.commit()
+
+    # Add a URL as pending (or with `status`); returns False when it was already known
+    def add(self, url, kind, source=None, status="pending"):
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO urls (key, url, kind, status, source, added_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (canonical_job_url(url), url, kind, status, source, now, now),
+            )
+            self._conn.commit()
+        return cursor.rowcount > 0
+
+    def pending(self, kind, limit=None):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT url FROM urls WHERE kind = ? AND status = 'pending' ORDER BY added_at LIMIT ?",
+                (kind, -1 if limit is None else limit),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    # Record an outcome: "done" and "blocked" are final; "error" retries until max_attempts
+    def mark(self, url, status, error=None):
+        with self._lock:
+            if status == "error":
+                self._conn.execute(
+                    "UPDATE urls SET attempts = attempts + 1, error = ?, updated_at = ?, "
+                    "status = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE 'pending' END WHERE key = ?",
+                    (error, time.time(), self.max_attempts, canonical_job_url(url)),
+                )
+            else:
+                self._conn.execute(
+                    "UPDATE urls SET status = ?, error = ?, updated_at = ? WHERE key = ?",
+                    (status, error, time.time(), canonical_job_url(url)),
+                )
+            self._conn.commit()
+
+    # Queue finished listing pages again, to pick up postings published since
+    def recrawl_listings(self):
+        with self._lock:
+            self._conn.execute("UPDATE urls SET status = 'pending', attempts = 0 WHERE kind = 'listing' AND status != 'blocked'")
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT kind, status, COUNT(*) FROM urls GROUP BY kind, status").fetchall()
+        return {f"{kind}_{status}": count for kind, status, count in rows}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# --- Crawler ---
+
+class Crawler:
+    def __init__(self, frontier, limiter=None, max_listing_pages=50, max_wait=8.0):
+        self.frontier = frontier
+        self.limiter = limiter or HostLimiter()
+        self.max_listing_pages = max_listing_pages  # Listing pages fetched per run (pagination bound)
+        self.max_wait = max_wait
+
+    # Static HTML first; a listing whose links only appear after rendering (no job
+    # links in the raw HTML) is fetched again through the browser tier
+    async def fetch_listing(self, url):
+        async with self.limiter.slot(url):
+            result = await fetch_static_async(url, headers=self.limiter.headers)
+        if result["status"] == 200:
+            links = discover_links(result["content"], result["url"])
+            if links["jobs"]:
+                return links, "static"
+        async with self.limiter.slot(url):
+            result = await fetch_rendered_async(url, max_wait=self.max_wait, headers=self.limiter.headers)
+        return discover_links(result["content"], result["url"]), "browser"
+
+    # Fetch one listing page and add its job links (reported through `found`) and
+    # next pages to the frontier
+    async def crawl_listing(self, url, found):
+        if not await self.limiter.allowed(url):
+            self.frontier.mark(url, "blocked")
+            return
+        try:
+            with get_tracer().span("crawl") as span:
+                links, tier = await self.fetch_listing(url)
+                span.update(tier=tier, jobs=len(links["jobs"]), listings=len(links["listings"]))
+        except Exception as e:
+            print(f"⚠️ Listing {url} failed: {type(e).__name__}: {e}")
+            self.frontier.mark(url, "error", error=f"{type(e).__name__}: {e}")
+            return
+        for job_url in links["jobs"]:
+            allowed = await self.limiter.allowed(job_url)
+            if self.frontier.add(job_url, "job", source=url, status="pending" if allowed else "blocked") and allowed:
+                found(job_url)
+        for listing_url in links["listings"]:
+            self.frontier.add(listing_url, "listing", source=url)
+        self.frontier.mark(url, "done")
+
+    # Crawl pending listing pages level by level until none are left or the page budget is spent
+    async def crawl_listings(self, start_urls, found):
+        for url in start_urls:
+            self.frontier.add(url, "listing")
+        crawled = 0
+        while crawled < self.max_listing_pages:
+            batch = self.frontier.pending("listing", limit=self.max_listing_pages - crawled)
+            if not batch:
+                return
+            crawled += len(batch)
+            await asyncio.gather(*(self.crawl_listing(url, found) for url in batch))
+
+    # Async stream of job URLs to process: those left pending by an interrupted run
+    # first, then new ones as listing pages are crawled (so processing starts
+    # before the crawl finishes)
+    async def job_urls(self, start_urls):
+        queue = asyncio.Queue()
+
+        async def produce():
+            try:
+                await self.crawl_listings(start_urls, queue.put_nowait)
+            finally:
+                queue.put_nowait(None)
+
+        producer = asyncio.create_task(produce())
+        try:
+            for url in self.frontier.pending("job"):
+                yield url
+            while (url := await queue.get()) is not None:
+                yield url
+            await producer
+        finally:
+            producer.cancel()
@@ -0,0 +1,291 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import numpy as np
+
+from utils import canonical_job_url
+
+# MinHash signature size, LSH bands (rows per band = NUM_PERM // LSH_BANDS) and
+# shingle size in words. 16 bands of 8 rows make postings with Jaccard similarity
+# around 0.7 and above likely to share a band; candidates are then checked exactly.
+NUM_PERM = 128
+LSH_BANDS = 16
+SHINGLE_WORDS = 3
+
+# Postings with fewer words are not fingerprinted (too little text for a stable signature)
+MIN_FINGERPRINT_WORDS = 50
+
+# Multiply-shift hash family derived from fixed digests, so signatures stay
+# comparable across runs, machines and numpy versions
+_PERM_A = np.array(
+    [int.from_bytes(hashlib.blake2b(f"a{i}".encode(), digest_size=8).digest(), "little") | 1 for i in range(NUM_PERM)],
+    dtype=np.uint64,
+)
+_PERM_B = np.array(
+    [int.from_bytes(hashlib.blake2b(f"b{i}".encode(), digest_size=8).digest(), "little") for i in range(NUM_PERM)],
+    dtype=np.uint64,
+)
+
+def shingle_hashes(text, shingle_words=SHINGLE_WORDS):
+    words = re.findall(r"\w+", text.lower())
+    shingles = {" ".join(words[i:i + shingle_words]) for i in range(max(0, len(words) - shingle_words + 1))}
+    return np.fromiter(
+        (int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little") for s in shingles),
+        dtype=np.uint64, count=len(shingles),
+    )
+
+# MinHash signature of the text's word shingles (NUM_PERM uint32 minima), or None
+# when the text has no shingles
+def minhash(text):
+    hashes = shingle_hashes(text)
+    if not len(hashes):
+        return None
+    with np.errstate(over="ignore"):  # uint64 wrap-around is the hash
+        mixed = (hashes[:, None] * _PERM_A + _PERM_B) >> np.uint64(32)
+    return mixed.min(axis=0).astype(np.uint32)
+
+# Estimated Jaccard similarity of the shingle sets behind two signatures
+def similarity(a, b):
+    return float(np.count_nonzero(a == b)) / len(a)
+
+# Comparable form of a posting title: lowercase words, without parenthesised notes
+# ("(Remote)") or a trailing " - Company" / " | Careers" part
+def title_key(title):
+    title = re.sub(r"\([^)]*\)|\[[^\]]*\]", " ", title or "")
+    title = re.split(r"\s+[|–—-]\s+", title)[0]
+    return " ".join(re.findall(r"\w+", title.lower()))
+
+# LSH bucket keys: one signed 64-bit digest per band of the signature
+def band_keys(signature):
+    rows = len(signature) // LSH_BANDS
+    return [
+        (band, int.from_bytes(hashlib.blake2b(signature[band * rows:(band + 1) * rows].tobytes(), digest_size=8).digest(), "little", signed=True))
+        for band in range(LSH_BANDS)
+    ]
+
+# Persistent near-duplicate index over job postings. A posting is found either by
+# its canonical URL (tracking params, ATS mirrors) or by the MinHash signature of its
+# role-specific text (preprocessing's `posting_text`: title plus requirement lists, so
+# a company's shared boilerplate does not make different roles look alike), and a
+# content match must also agree on the title. Signatures are bucketed by LSH band in
+# an indexed SQLite table, so a lookup only compares the few postings sharing a band
+# instead of scanning them all. Each posting keeps its extraction and generated
+# emails so duplicates can reuse them; postings older than `ttl` no longer match and
+# are purged, so an edited page is extracted again.
+class DuplicateIndex:
+    def __init__(self, path="cache/dedup.sqlite3", threshold=0.8, min_words=MIN_FINGERPRINT_WORDS, ttl=7 * 24 * 3600):
+        self.path = path
+        self.threshold = threshold  # Minimum estimated Jaccard similarity to count as a duplicate
+        self.min_words = min_words
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS postings (
+                id INTEGER PRIMARY KEY,
+                url TEXT NOT NULL,
+                signature BLOB,
+                title TEXT NOT NULL DEFAULT '',
+                jobs TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS aliases (
+                canonical_url TEXT PRIMARY KEY,
+                posting_id INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS bands (
+                band INTEGER NOT NULL,
+                value INTEGER NOT NULL,
+                posting_id INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS bands_lookup ON bands (band, value);
+            CREATE INDEX IF NOT EXISTS bands_posting ON bands (posting_id);
+            CREATE TABLE IF NOT EXISTS emails (
+                posting_id INTEGER NOT NULL,
+                role TEXT NOT NULL,
+                tone TEXT NOT NULL,
+                email TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (posting_id, role, tone)
+            );
+            """
+        )
+        # Indexes created before titles were stored
+        if "title" not in {row[1] for row in self._conn.execute("PRAGMA table_info(postings)")}:
+            self._conn.execute("ALTER TABLE postings ADD COLUMN title TEXT NOT NULL DEFAULT ''")
+        self._conn.commit()
+
+    def fingerprint(self, text):
+        if len(text.split()) < self.min_words:
+            return None
+        return minhash(text)
+
+    def _match(self, posting_id, match, score=1.0):
+        row = self._conn.execute("SELECT url, jobs FROM postings WHERE id = ?", (posting_id,)).fetchone()
+        if row is None:
+            return None
+        return {"id": posting_id, "url": row[0], "jobs": json.loads(row[1]), "match": match, "similarity": round(score, 3)}
+
+    # Postings registered before this are expired
+    def _cutoff(self):
+        return time.time() - self.ttl
+
+    # Drop expired postings with their aliases, bands and emails
+    def _purge_expired(self):
+        expired = "SELECT id FROM postings WHERE created_at < ?"
+        cutoff = self._cutoff()
+        for table in ("aliases", "bands", "emails"):
+            self._conn.execute(f"DELETE FROM {table} WHERE posting_id IN ({expired})", (cutoff,))
+        self._conn.execute("DELETE FROM postings WHERE created_at < ?", (cutoff,))
+
+    # Earlier posting this URL was recorded as a copy of (a mirror, or a repost found by
+    # content), or None. The URL's own registration is not a match: whether its page is
+    # unchanged is decided by content, after fetching (lookup_text).
+    def lookup_url(self, url):
+        canonical = canonical_job_url(url)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT a.posting_id, p.url FROM aliases a JOIN postings p ON p.id = a.posting_id "
+                "WHERE a.canonical_url = ? AND p.created_at >= ?", (canonical, self._cutoff())
+            ).fetchone()
+            if row is None or canonical_job_url(row[1]) == canonical:
+                return None
+            return self._match(row[0], "url")
+
+    # Most similar earlier posting at or above the threshold, or None. When `title` is
+    # given, only postings with the same title (or none stored) are considered.
+    def lookup_text(self, text, title=None, fingerprint=None):
+        fingerprint = fingerprint if fingerprint is not None else self.fingerprint(text)
+        if fingerprint is None:
+            return None
+        key = title_key(title)
+        keys = band_keys(fingerprint)
+        where = " OR ".join("(b.band = ? AND b.value = ?)" for _ in keys)
+        params = [v for key in keys for v in key]
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT DISTINCT p.id, p.signature, p.title FROM bands b JOIN postings p ON p.id = b.posting_id "
+                f"WHERE p.created_at >= ? AND ({where})", [self._cutoff(), *params]
+            ).fetchall()
+            best = max(
+                (
+                    (similarity(fingerprint, np.frombuffer(signature, dtype=np.uint32)), posting_id)
+                    for posting_id, signature, stored_title in rows
+                    if not key or not stored_title or stored_title == key
+                ),
+                default=None,
+            )
+            if best is None or best[0] < self.threshold:
+                return None
+            return self._match(best[1], "content", best[0])
+
+    # URL first (no fetch needed), then content
+    def lookup(self, url, text=None, title=None):
+        return self.lookup_url(url) or (self.lookup_text(text, title) if text else None)
+
+    # Register a processed posting (its extracted jobs) and return its id. A URL that
+    # is already registered (its page changed) keeps its posting id, with the new text,
+    # extraction and expiry; emails written for the old extraction are dropped.
+    def add(self, url, text, jobs, title=None):
+        fingerprint = self.fingerprint(text) if text else None
+        signature = fingerprint.tobytes() if fingerprint is not None else None
+        canonical = canonical_job_url(url)
+        with self._lock:
+            self._purge_expired()
+            row = self._conn.execute(
+                "SELECT a.posting_id, p.url FROM aliases a JOIN postings p ON p.id = a.posting_id WHERE a.canonical_url = ?",
+                (canonical,),
+            ).fetchone()
+            if row is not None and canonical_job_url(row[1]) == canonical:
+                posting_id = row[0]
+                self._conn.execute(
+                    "UPDATE postings SET url = ?, signature = ?, title = ?, jobs = ?, created_at = ? WHERE id = ?",
+                    (url, signature, title_key(title), json.dumps(jobs), time.time(), posting_id),
+                )
+                self._conn.execute("DELETE FROM bands WHERE posting_id = ?", (posting_id,))
+                self._conn.execute("DELETE FROM emails WHERE posting_id = ?", (posting_id,))
+            else:
+                cursor = self._conn.execute(
+                    "INSERT INTO postings (url, signature, title, jobs, created_at) VALUES (?, ?, ?, ?, ?)",
+                    (url, signature, title_key(title), json.dumps(jobs), time.time()),
+                )
+                posting_id = cursor.lastrowid
+                # Also re-points a URL that was a copy of another posting
+                self._conn.execute("INSERT OR REPLACE INTO aliases (canonical_url, posting_id) VALUES (?, ?)", (canonical, posting_id))
+            if fingerprint is not None:
+                self._conn.executemany(
+                    "INSERT INTO bands (band, value, posting_id) VALUES (?, ?, ?)",
+                    [(band, value, posting_id) for band, value in band_keys(fingerprint)],
+                )
+            self._conn.commit()
+        return posting_id
+
+    # Remember another URL of a known posting, so it is caught before fetching next time
+    def add_alias(self, url, posting_id):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO aliases (canonical_url, posting_id) VALUES (?, ?)", (canonical_job_url(url), posting_id)
+            )
+            self._conn.commit()
+
+    # Emails are stored against the posting's first URL; `url` re-points a stored
+    # email at the URL being served (and a new one back, when storing)
+    def get_email(self, posting_id, role, tone, url=None):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT e.email, p.url FROM emails e JOIN postings p ON p.id = e.posting_id "
+                "WHERE e.posting_id = ? AND e.role = ? AND e.tone = ?", (posting_id, role, tone)
+            ).fetchone()
+        if row is None:
+            return None
+        email, posting_url = row
+        return email.replace(posting_url, url) if url else email
+
+    def put_email(self, posting_id, role, tone, email, url=None):
+        with self._lock:
+            if url:
+                row = self._conn.execute("SELECT url FROM postings WHERE id = ?", (posting_id,)).fetchone()
+                if row is not None and row[0] != url:
+                    email = email.replace(url, row[0])
+            self._conn.execute(
+                "INSERT OR REPLACE INTO emails (posting_id, role, tone, email, created_at) VALUES (?, ?, ?, ?, ?)",
+                (posting_id, role, tone, email, time.time()),
+            )
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            postings = self._conn.execute("SELECT COUNT(*) FROM postings").fetchone()[0]
+            aliases = self._conn.execute("SELECT COUNT(*) FROM aliases").fetchone()[0]
+            emails = self._conn.execute("SELECT COUNT(*) FROM emails").fetchone()[0]
+        return {"postings": postings, "aliases": aliases, "emails": emails, "threshold": self.threshold}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# --- Process-wide index ---
+
+_index = None
+_index_lock = threading.Lock()
+
+# Return the shared duplicate index (path and expiry in seconds overridable via
+# DEDUP_PATH and DEDUP_TTL)
+def get_duplicate_index():
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = DuplicateIndex(
+                path=os.getenv("DEDUP_PATH", "cache/dedup.sqlite3"),
+                ttl=float(os.getenv("DEDUP_TTL", 7 * 24 * 3600)),
+            )
+        return _index
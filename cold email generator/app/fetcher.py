@@ -0,0 +1,192 @@
+import asyncio
+import re
+import time
+import weakref
+import httpx
+
+from browser_pool import get_browser_pool
+from metrics import get_tracer
+from parsing import parse_html, scan_page
+from readiness import wait_for_page_ready, settle_after_scroll
+from utils import JOB_SECTION_KEYWORDS
+
+# Browser-like headers so server-rendered job boards return the full page
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+
+# Minimum visible text and distinct job-section headings for a static page to be "enough"
+MIN_JOB_TEXT_CHARS = 500
+MIN_JOB_SECTION_HITS = 2
+
+# --- Static HTTP tier ---
+
+# One pooled client per event loop (httpx connections are bound to the loop that opened them)
+_http_clients = weakref.WeakKeyDictionary()
+
+# Return the keep-alive HTTP client for the running loop, creating it on first use
+def get_http_client():
+    loop = asyncio.get_running_loop()
+    client = _http_clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            headers=DEFAULT_HEADERS,
+            follow_redirects=True,
+            timeout=httpx.Timeout(15.0, connect=5.0),
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=30.0),
+        )
+        _http_clients[loop] = client
+    return client
+
+# Close the running loop's client (call before the loop itself shuts down)
+async def close_http_client():
+    client = _http_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+# Plain GET through the pooled client (gzip/deflate, and br when brotli is installed)
+async def fetch_static_async(url, headers=None):
+    response = await get_http_client().get(url, headers=headers)
+    return static_result(response)
+
+# Fetch result for an httpx response, with the validators for later revalidation
+def static_result(response):
+    return {
+        "url": str(response.url),
+        "status": response.status_code,
+        "content": response.text,
+        "etag": response.headers.get("etag"),
+        "last_modified": response.headers.get("last-modified"),
+    }
+
+# Decide whether raw HTML already carries the job posting, using the same
+# section-keyword heuristic as extract_relevant_sections
+def has_job_content(html, min_chars=MIN_JOB_TEXT_CHARS, min_hits=MIN_JOB_SECTION_HITS):
+    text = scan_page(parse_html(html))["full_text"]
+    if len(text) < min_chars:
+        return False
+    hits = {m.lower() for m in re.findall(JOB_SECTION_KEYWORDS, text, re.IGNORECASE)}
+    return len(hits) >= min_hits
+
+# --- Browser (Playwright) tier ---
+
+# Asynchronously fetch the rendered page HTML using a pooled Playwright page (for JS-heavy
+# pages), so both tiers hand the same DOM structure to the parsing stage.
+# Returns the HTML plus which readiness condition ended the wait. `headers` (e.g., a
+# crawler User-Agent) apply to this page only; pooled pages are closed after each run.
+async def fetch_rendered_async(url, max_wait=8.0, headers=None):
+    async def load(page):
+        if headers:
+            await page.set_extra_http_headers(headers)
+        response = await page.goto(url, timeout=120000, wait_until="domcontentloaded")
+        # Stop waiting as soon as the page is stable instead of sleeping a fixed 8s
+        wait_reason, wait_seconds = await wait_for_page_ready(page, max_wait=max_wait)
+        await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+        await settle_after_scroll(page)  # Give lazy-loaded content a brief chance to render
+        return {
+            "url": page.url,
+            "content": await page.content(),
+            "wait_reason": wait_reason,
+            "wait_seconds": wait_seconds,
+            # Validators from the document response, for conditional revalidation later
+            "etag": response.headers.get("etag") if response else None,
+            "last_modified": response.headers.get("last-modified") if response else None,
+        }
+
+    return await get_browser_pool().run(load)
+
+# Asynchronously fetch rendered page HTML with Playwright (content only)
+async def fetch_html_async(url, max_wait=8.0):
+    result = await fetch_rendered_async(url, max_wait=max_wait)
+    return result["content"]
+
+# --- Tiered fetch ---
+
+# Try the static HTTP tier first and fall back to Playwright when the raw HTML
+# lacks job content (JS-rendered pages, blocks, errors). The result records
+# which tier served the URL in `tier` ("static" or "browser"). `static` is a static
+# result already in hand (e.g., from revalidation), used instead of fetching again.
+async def fetch_live_async(url, max_wait=8.0, force_browser=False, headers=None, static=None):
+    start = time.perf_counter()
+    fallback_reason = "forced"
+    if not force_browser:
+        try:
+            result = static or await fetch_static_async(url, headers=headers)
+            if result["status"] == 200 and has_job_content(result["content"]):
+                result.update(tier="static", elapsed=time.perf_counter() - start)
+                return result
+            fallback_reason = f"http_{result['status']}" if result["status"] != 200 else "thin_content"
+        except httpx.HTTPError as e:
+            fallback_reason = type(e).__name__
+    result = await fetch_rendered_async(url, max_wait=max_wait, headers=headers)
+    result.update(tier="browser", fallback_reason=fallback_reason, elapsed=time.perf_counter() - start)
+    return result
+
+# Ask the origin whether a stale cached page changed (If-None-Match / If-Modified-Since).
+# Returns the response as a static fetch result (status 304 when unchanged, 200 with
+# the new body when changed), or None when there are no validators or the request failed.
+async def revalidate_async(url, entry, headers=None):
+    conditions = {}
+    if entry.get("etag"):
+        conditions["If-None-Match"] = entry["etag"]
+    if entry.get("last_modified"):
+        conditions["If-Modified-Since"] = entry["last_modified"]
+    if not conditions:
+        return None
+    try:
+        response = await get_http_client().get(url, headers={**(headers or {}), **conditions})
+    except httpx.HTTPError:
+        return None
+    return static_result(response)
+
+# Cache-aware tiered fetch. Fresh cache entries skip the network entirely; stale
+# ones are revalidated with a conditional request. When the page changed, that
+# response stands in for the live fetch's static tier (no second GET), so only thin
+# or failed pages go on to the browser. `cache` is reported as "hit", "revalidated",
+# "miss" or "bypass".
+async def _fetch_page(url, max_wait, force_browser, cache, refresh, headers):
+    start = time.perf_counter()
+    if cache is None:
+        result = await fetch_live_async(url, max_wait=max_wait, force_browser=force_browser, headers=headers)
+        result["cache"] = "bypass"
+        return result
+
+    entry = None if refresh else cache.get(url)
+    static = None
+    if entry is not None and not (force_browser and entry["tier"] != "browser"):
+        status = "hit" if entry["fresh"] else None
+        if status is None:
+            response = await revalidate_async(url, entry, headers=headers)
+            if response is not None and response["status"] == 304:
+                cache.touch(url)
+                status = "revalidated"
+            elif response is not None:
+                static = response
+        if status is not None:
+            entry.update(cache=status, elapsed=time.perf_counter() - start)
+            return entry
+
+    result = await fetch_live_async(url, max_wait=max_wait, force_browser=force_browser, headers=headers, static=static)
+    cache.put(url, result)
+    result["cache"] = "miss"
+    return result
+
+# Traced entry point: one "fetch" span per URL with the tier, cache result and the
+# browser readiness/fallback reasons. `headers` override the default request headers.
+async def fetch_page_async(url, max_wait=8.0, force_browser=False, cache=None, refresh=False, headers=None):
+    with get_tracer().span("fetch") as span:
+        result = await _fetch_page(url, max_wait, force_browser, cache, refresh, headers)
+        span.update({k: result[k] for k in ("tier", "cache", "wait_reason", "fallback_reason") if result.get(k)})
+        return result
+
+# Synchronous wrapper around the tiered fetch
+def fetch_page_sync(url, **kwargs):
+    async def run():
+        try:
+            return await fetch_page_async(url, **kwargs)
+        finally:
+            await close_http_client()
+
+    return asyncio.run(run())
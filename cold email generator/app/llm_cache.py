@@ -0,0 +1,104 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+# Persistent LLM response cache. Entries are keyed by a hash of the model name,
+# temperature, prompt template and rendered input variables, so any change to
+# the prompt or its inputs is a miss. Bounded by entry count and age.
+class LLMCache:
+    def __init__(self, path="cache/llm_cache.sqlite3", max_entries=50000, max_age=7 * 24 * 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age = max_age  # Seconds; older entries are treated as misses and evicted
+        self.hits = Counter()  # Per-method hit/miss counters for this process
+        self.misses = Counter()
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                method TEXT NOT NULL,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_created_at ON responses (created_at)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(model, temperature, template, variables):
+        payload = json.dumps(
+            {"model": model, "temperature": temperature, "template": template, "variables": variables},
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    # Return the cached response text or None (counts a hit or miss for `method`)
+    def get(self, key, method):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or time.time() - row[1] > self.max_age:
+            self.misses[method] += 1
+            return None
+        self.hits[method] += 1
+        return row[0]
+
+    def put(self, key, method, model, response):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, method, model, response, created_at) VALUES (?, ?, ?, ?, ?)",
+                (key, method, model, response, time.time()),
+            )
+            self._evict()
+            self._conn.commit()
+
+    # Drop expired entries, then the oldest ones beyond max_entries
+    def _evict(self):
+        self._conn.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.max_age,))
+        count = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        if count > self.max_entries:
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY created_at LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {"entries": entries, "hits": dict(self.hits), "misses": dict(self.misses)}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# --- Process-wide cache ---
+
+_cache = None
+_cache_lock = threading.Lock()
+
+# Return the shared LLM cache (path overridable via LLM_CACHE_PATH)
+def get_llm_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache(path=os.getenv("LLM_CACHE_PATH", "cache/llm_cache.sqlite3"))
+        return _cache
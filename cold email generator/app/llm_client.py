@@ -0,0 +1,218 @@
+import asyncio
+import os
+import random
+import time
+import groq
+import httpx
+from email.utils import parsedate_to_datetime
+from langchain_core.exceptions import OutputParserException
+
+from metrics import get_tracer
+from utils import estimate_tokens
+
+# HTTP statuses worth retrying: timeouts, conflicts, rate limits and server errors
+RETRYABLE_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+# Output tokens reserved per call when charging the tokens-per-minute bucket
+DEFAULT_COMPLETION_TOKENS = 512
+
+# --- Error classification and backoff ---
+
+# Parse a Retry-After header (seconds or HTTP date) into seconds, if present
+def parse_retry_after(headers):
+    value = (headers or {}).get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+# Return (retryable, retry_after_seconds) for an exception raised by an LLM call.
+# Output parsing failures are never retryable here; callers handle them separately.
+def classify_error(exc):
+    if isinstance(exc, OutputParserException):
+        return False, None
+    if isinstance(exc, (groq.APIConnectionError, httpx.TimeoutException, httpx.TransportError)):
+        return True, None
+    status = getattr(exc, "status_code", None)
+    if status in RETRYABLE_STATUSES:
+        response = getattr(exc, "response", None)
+        return True, parse_retry_after(getattr(response, "headers", None))
+    return False, None
+
+# Full-jitter exponential backoff, never shorter than the server's Retry-After
+def backoff_delay(attempt, base_delay=1.0, max_delay=60.0, retry_after=None):
+    delay = random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+    return max(delay, retry_after) if retry_after is not None else delay
+
+# Synchronous retry helper for Chain methods: backs off on retryable API errors and
+# re-asks (bypassing the response cache) up to `parse_retries` times on parse errors.
+# Retries are counted under `method`, by default the function's name.
+def call_with_retries(fn, *args, max_retries=2, parse_retries=1, base_delay=1.0, max_delay=20.0, method=None, **kwargs):
+    method = method or getattr(getattr(fn, "func", fn), "__name__", "llm")  # Unwraps functools.partial
+    attempt = 0
+    while True:
+        try:
+            return fn(*args, **kwargs)
+        except OutputParserException:
+            if parse_retries <= 0:
+                raise
+            parse_retries -= 1
+            kwargs["bypass_cache"] = True
+            get_tracer().record_retry(method)
+        except Exception as e:
+            retryable, retry_after = classify_error(e)
+            if not retryable or attempt >= max_retries:
+                raise
+            delay = backoff_delay(attempt, base_delay, max_delay, retry_after)
+            print(f"⚠️ LLM call failed ({e}); retrying in {delay:.1f}s")
+            get_tracer().record_retry(method)
+            time.sleep(delay)
+            attempt += 1
+
+# --- Rate limiting ---
+
+class TokenBucket:
+    def __init__(self, capacity, per_minute):
+        self.capacity = capacity
+        self.rate = per_minute / 60.0  # Refill per second
+        self.level = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    # Seconds until `amount` is available (0 if it can be taken now)
+    def wait_time(self, amount):
+        self._refill()
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount):
+        self._refill()
+        self.level -= min(amount, self.capacity)
+
+# Requests-per-minute and tokens-per-minute buckets sized from the provider quota.
+# A 429 with Retry-After pauses every caller, not just the one that was throttled.
+class RateLimiter:
+    def __init__(self, requests_per_minute=30, tokens_per_minute=6000):
+        self.requests = TokenBucket(requests_per_minute, requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute, tokens_per_minute)
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds):
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def acquire(self, tokens):
+        async with self._lock:
+            while True:
+                wait = max(
+                    self._paused_until - time.monotonic(),
+                    self.requests.wait_time(1),
+                    self.tokens.wait_time(tokens),
+                )
+                if wait <= 0:
+                    self.requests.take(1)
+                    self.tokens.take(tokens)
+                    return
+                await asyncio.sleep(wait)
+
+# --- Async execution layer ---
+
+# Async wrapper around Chain with bounded global and per-model concurrency, quota-driven
+# rate limiting, and jittered exponential backoff that honours Retry-After. Retryable API
+# errors are backed off; OutputParserExceptions are re-asked at most `parse_retries` times.
+class AsyncChain:
+    def __init__(self, chain, max_concurrency=8, per_model_concurrency=4,
+                 requests_per_minute=None, tokens_per_minute=None,
+                 max_retries=5, parse_retries=1, base_delay=1.0, max_delay=60.0):
+        self.chain = chain
+        self.max_retries = max_retries
+        self.parse_retries = parse_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.per_model_concurrency = per_model_concurrency
+        self._global = asyncio.Semaphore(max_concurrency)
+        self._per_model = {}
+        # Quotas default to GROQ_RPM / GROQ_TPM, else the free-tier limits for the 8B model
+        self.limiter = RateLimiter(
+            requests_per_minute or int(os.getenv("GROQ_RPM", 30)),
+            tokens_per_minute or int(os.getenv("GROQ_TPM", 6000)),
+        )
+        self.retries = 0  # Retry counter for instrumentation
+
+    def _model_semaphore(self, model):
+        if model not in self._per_model:
+            self._per_model[model] = asyncio.Semaphore(self.per_model_concurrency)
+        return self._per_model[model]
+
+    # Call a Chain method (by name) off the event loop under the limits above
+    async def call(self, method, *args, **kwargs):
+        fn = getattr(self.chain, method)
+        prompt_tokens = sum(estimate_tokens(str(arg)) for arg in list(args) + list(kwargs.values()))
+        parse_retries = self.parse_retries
+        attempt = 0
+        while True:
+            async with self._global, self._model_semaphore(self.chain.model_name):
+                await self.limiter.acquire(prompt_tokens + DEFAULT_COMPLETION_TOKENS)
+                try:
+                    return await asyncio.to_thread(fn, *args, **kwargs)
+                except OutputParserException:
+                    if parse_retries <= 0:
+                        raise
+                    parse_retries -= 1
+                    kwargs["bypass_cache"] = True
+                    self.chain.tracer.record_retry(method)
+                    continue
+                except Exception as e:
+                    retryable, retry_after = classify_error(e)
+                    if not retryable or attempt >= self.max_retries:
+                        raise
+                    if retry_after:
+                        self.limiter.pause(retry_after)
+                    delay = backoff_delay(attempt, self.base_delay, self.max_delay, retry_after)
+                    attempt += 1
+                    self.retries += 1
+                    self.chain.tracer.record_retry(method)
+            # Sleep outside the semaphores so other calls can proceed meanwhile
+            await asyncio.sleep(delay)
+
+    # Map-reduce extraction for pages over the token budget: every chunk is its own
+    # call(), so each one takes a concurrency slot and is charged against the quotas
+    async def _extract(self, method, cleaned_text, **kwargs):
+        chunks = self.chain.page_chunks(cleaned_text)
+        if len(chunks) == 1:
+            return await self.call(method, cleaned_text, **kwargs)
+
+        async def run_chunk(index, chunk):
+            try:
+                return await self.call(f"{method}_chunk", chunk, **kwargs)
+            except OutputParserException as e:
+                print(f"⚠️ Skipping chunk {index} due to parsing error: {e}")
+                return None
+
+        with self.chain.tracer.span("map_reduce", chunks=len(chunks), tokens=estimate_tokens(cleaned_text)):
+            results = await asyncio.gather(*(run_chunk(i, chunk) for i, chunk in enumerate(chunks)))
+            return self.chain.reduce_chunk_jobs(results)
+
+    async def extract_jobs(self, cleaned_text, **kwargs):
+        return await self._extract("extract_jobs", cleaned_text, **kwargs)
+
+    async def extract_and_summarize(self, cleaned_text, **kwargs):
+        return await self._extract("extract_and_summarize", cleaned_text, **kwargs)
+
+    async def extract_role_summary(self, cleaned_text, skills, **kwargs):
+        return await self.call("extract_role_summary", cleaned_text, skills=skills, **kwargs)
+
+    async def summarize(self, text, **kwargs):
+        return await self.call("summarize", text, **kwargs)
+
+    async def write_mail(self, job, links, job_url=None, **kwargs):
+        return await self.call("write_mail", job, links, job_url, **kwargs)
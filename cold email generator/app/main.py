@@ -1,93 +1,211 @@
+import functools
+import hashlib
+import itertools
+import json
 import streamlit as st
 import urllib.parse
-import asyncio
 import os
 import re
-from playwright.async_api import async_playwright
-from bs4 import BeautifulSoup
+import threading
+import time
+from collections import OrderedDict
 from streamlit.components.v1 import html
 
-from chains import Chain
+from browser_pool import get_browser_pool
+from chains import TONES, Chain
+from dedup import get_duplicate_index
+from fetcher import fetch_page_sync
+from llm_cache import get_llm_cache
+from llm_client import call_with_retries
+from metrics import get_tracer
+from page_cache import get_page_cache
 from portfolio import Portfolio
-from utils import clean_text as text_cleaner
+from preprocessing import prepare_page
+from skill_matcher import SkillMatcher, build_vocabulary
+from utils import canonical_job_url, clean_text as text_cleaner
 
 # Disable tokenizer parallelism to prevent warnings in LLM environments
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
 
-# --- Playwright Helpers ---
-
-# Asynchronously fetch page HTML using Playwright (for JS-heavy pages)
-async def fetch_html_async(url):
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        page = await browser.new_page()
-        try:
-            await page.goto(url, timeout=120000, wait_until="domcontentloaded")
-            await asyncio.sleep(3)  # Wait for JS to settle
-            await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-            await asyncio.sleep(5)  # Wait for content to hydrate
-            content = await page.inner_text('body')
-        finally:
-            await browser.close()
-        return content
-
-# Synchronous wrapper around the async Playwright function
-def fetch_html_sync(url):
-    return asyncio.run(fetch_html_async(url))
-
 # --- Retry for LLM Calls ---
 
-# Try calling LLM to extract job info with basic retry logic
-def try_extract_jobs(llm, text, retries=2):
-    for attempt in range(retries):
-        try:
-            jobs = llm.extract_jobs(text)
-            if jobs:
-                return jobs
-        except Exception as e:
-            print(f"⚠️ LLM parsing failed on attempt {attempt+1}: {e}")
+# Try calling LLM to extract job info, backing off on rate limits/server errors
+# and re-asking once on unparseable output
+# (uses the single extraction + summary call when the chain has it enabled, or the
+# shrunk role/summary call when `skills` were already found locally)
+def try_extract_jobs(llm, text, retries=2, skills=None):
+    if skills:
+        extract = functools.partial(llm.extract_role_summary, skills=skills)
+    elif getattr(llm, "combined_extraction", False):
+        extract = llm.extract_and_summarize
+    else:
+        extract = llm.extract_jobs
+    try:
+        return call_with_retries(extract, text, max_retries=retries, parse_retries=retries - 1) or []
+    except Exception as e:
+        print(f"⚠️ LLM job extraction failed: {e}")
     return []
 
-# --- HTML Parsing Helpers ---
-
-# Extract job-relevant sections (Qualifications/Responsibilities)
-def extract_relevant_sections(soup):
-    sections = soup.find_all("section") + soup.find_all("div")
-    candidates = []
-    for section in sections:
-        if section and section.get_text():
-            if re.search(r"(Qualifications|Requirements|Experience|Responsibilities)", section.get_text(), re.IGNORECASE):
-                candidates.append(section.get_text(separator="\n"))
-    return "\n".join(candidates)
-
-# Try to extract number of years of experience mentioned
-def extract_experience_years(text):
-    patterns = [
-        r"(\d+)\+?\s*(?:years?|yrs?)\s+of\s+[\w\s]+experience"
-        r"(\d+)\+?\s*(?:years?|yrs?)\s+(?:of\s+)?(?:.*?\s)?experience",
-        r"minimum\s+of\s+(\d+)\+?\s*(?:years?|yrs?)",
-        r"(?:typically|around|approximately)?\s*(\d+)\+?\s*(?:years?|yrs?)\b",
-        r"experience.*?(\d+)\+?\s*(?:years?|yrs?)",
-        r"(\d+)\+?\s*(?:years?|yrs?)\s+technical",
-        r"(\d+)\+?\s*(?:years?|yrs?)\s+in\s+.*",
-    ]
-    found_years = []
-    for pattern in patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
-        found_years.extend([int(m) for m in matches if m.isdigit()])
-    return f"{max(found_years)} years" if found_years else "Not specified"
-
-# Summarize job description using LLM with retries
-def summarize_job_description(llm, text, max_retries=2):
-    for attempt in range(max_retries):
+# --- Cached Resources and Pipeline Stages ---
+# Streamlit reruns the whole script on every widget change (tone switch, Regenerate).
+# Long-lived objects live in the resource cache; each pipeline stage is memoized by
+# URL so a rerun only repeats the work whose inputs actually changed.
+
+STAGE_TTL = 3600  # Seconds to keep per-URL stage results
+PORTFOLIO_TOP_K = 8  # Best-matching portfolio links offered to the email prompt
+RETRIEVAL_MODE = "hybrid"  # "hybrid" (lexical + vector) or "lexical"
+MIN_LOCAL_SKILLS = 5  # High-confidence local skill matches needed to skip LLM skill extraction
+PREGENERATE_TONES = True  # Draft every tone variant in the background once extraction finishes
+TONE_CONCURRENCY = 2  # Tone variants generated in parallel (keeps within the provider rate limit)
+TONE_STORE_SIZE = 256  # Jobs whose tone variants stay in memory (least recently used evicted)
+
+# Raised (so the empty result is not memoized) when the LLM returns no jobs
+class NoJobsExtracted(Exception):
+    pass
+
+@st.cache_resource(show_spinner=False)
+def load_chain():
+    # Robust prompt includes skill/role enforcement; one call extracts and summarizes.
+    # The client does not retry: call_with_retries owns retries and backoff.
+    return Chain(prompt_mode="robust", cache=get_llm_cache(), combined_extraction=True, max_retries=0)
+
+@st.cache_resource(show_spinner=False)
+def load_portfolio():
+    user_portfolio = Portfolio()  # Portfolio with tech-link mappings
+    user_portfolio.load_portfolio()  # Load portfolio into the vector store if not loaded yet
+    return user_portfolio
+
+@st.cache_resource(show_spinner=False)
+def load_skill_matcher(_user_portfolio):
+    # Synonym table plus the portfolio's Techstack vocabulary
+    return SkillMatcher(build_vocabulary(_user_portfolio.techstack_terms))
+
+@st.cache_resource(show_spinner=False)
+def load_browser_pool():
+    return get_browser_pool()  # Shared Chromium pool survives reruns
+
+# Emails per job and tone, shared by all sessions and the background generation
+# threads. Entries expire after STAGE_TTL and at most TONE_STORE_SIZE are kept.
+@st.cache_resource(show_spinner=False)
+def tone_variant_store():
+    return {"lock": threading.Lock(), "entries": OrderedDict()}
+
+# Store key for a job's emails. Drafts depend on the job description and on the
+# portfolio links offered to the prompt, so another portfolio gets its own variants.
+def variant_key(job_key, job, links):
+    payload = json.dumps([job_key, job.get("description", ""), links])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+# Live store entry for a key, created when missing or expired (call with the lock held)
+def variant_entry(store, key):
+    entries = store["entries"]
+    entry = entries.get(key)
+    if entry is None or time.time() - entry["created_at"] > STAGE_TTL:
+        entry = entries[key] = {"variants": {}, "started": False, "created_at": time.time()}
+    entries.move_to_end(key)
+    while len(entries) > TONE_STORE_SIZE:
+        entries.popitem(last=False)
+    return entry
+
+# Generate the other tone variants for a job in a background thread, storing each email
+# as soon as it completes so a later tone switch is served without an LLM call. The
+# displayed tone is skipped: it is streamed in the foreground and stored from there.
+def start_tone_variants(llm, job, links, job_url, key, displayed_tone=None):
+    store = tone_variant_store()
+    with store["lock"]:
+        entry = variant_entry(store, key)
+        if entry["started"]:
+            return
+        entry["started"] = True
+        variants = entry["variants"]
+
+    def generate():
         try:
-            return llm.summarize(text)
+            tones = [tone for tone in TONES if tone != displayed_tone]
+            for tone, email in llm.write_mail_variants(job, links, job_url, tones=tones, max_concurrency=TONE_CONCURRENCY):
+                with store["lock"]:
+                    variants.setdefault(tone, email)
         except Exception as e:
-            print(f"⚠️ Summarization failed (attempt {attempt+1}): {e}")
-    return "Summary not available due to an error."
+            print(f"⚠️ Background tone generation failed: {e}")
+            with store["lock"]:
+                entry["started"] = False  # Allow a later rerun to try again
+
+    threading.Thread(target=generate, daemon=True).start()
+
+# Pre-generated email for a job and tone, if it has completed
+def stored_variant(key, tone):
+    store = tone_variant_store()
+    with store["lock"]:
+        return variant_entry(store, key)["variants"].get(tone)
+
+# Store the draft shown in the foreground (a regenerated draft replaces the earlier one)
+def store_variant(key, tone, email):
+    store = tone_variant_store()
+    with store["lock"]:
+        variant_entry(store, key)["variants"][tone] = email
+
+@st.cache_data(show_spinner=False, ttl=STAGE_TTL)
+def fetch_stage(url):
+    # Page cache first, then static HTTP, then Playwright fallback
+    return fetch_page_sync(url, cache=get_page_cache())
+
+@st.cache_data(show_spinner=False, ttl=STAGE_TTL)
+def parse_stage(url, _clean_fn, _skill_matcher=None):
+    # Main content, cleaned prompt text, experience (with spans) and local skills
+    prepared = prepare_page(fetch_stage(url)["content"], clean_fn=_clean_fn, skill_matcher=_skill_matcher)
+    get_tracer().record_timings(prepared["timings"])
+    return prepared
+
+@st.cache_data(show_spinner=False, ttl=STAGE_TTL)
+def known_posting_stage(url):
+    # A URL already recorded as a copy of an earlier posting needs no fetch or parse
+    with get_tracer().span("dedup", by="url") as attrs:
+        duplicate = get_duplicate_index().lookup_url(url)
+        attrs["hit"] = duplicate is not None
+    return duplicate
+
+@st.cache_data(show_spinner=False, ttl=STAGE_TTL)
+def extract_stage(url, _llm, _cleaned_text, _local_skills=None, _confident_skills=None, _posting=None, _experience=""):
+    # A repost of an earlier posting (or this URL's own page, unchanged) reuses its
+    # extraction. `_posting` is the page's (title, role-specific text) from prepare_page.
+    title, posting_text = _posting or ("", _cleaned_text)
+    index = get_duplicate_index()
+    with get_tracer().span("dedup", by="content") as attrs:
+        duplicate = index.lookup_text(posting_text, title)
+        attrs["hit"] = duplicate is not None
+    if duplicate is not None:
+        index.add_alias(url, duplicate["id"])
+        return {"jobs": duplicate["jobs"], "posting_id": duplicate["id"], "duplicate": duplicate}
+    # Enough confidently matched local skills: the LLM only fills in role/description/summary
+    skills = _local_skills if len(_confident_skills or ()) >= MIN_LOCAL_SKILLS else None
+    jobs = try_extract_jobs(_llm, _cleaned_text, skills=skills)
+    if not jobs:
+        raise NoJobsExtracted(url)
+    # Stored with the page's experience so a later copy can skip fetching it
+    jobs = [dict(job, experience=_experience) for job in jobs]
+    return {"jobs": jobs, "posting_id": index.add(url, posting_text, jobs, title), "duplicate": None}
 
 # --- Main Streamlit App UI ---
 
+# Render a token stream as it arrives (keeping line breaks) and return the full text
+def render_stream(stream):
+    parts = []
+
+    def markdown_chunks():
+        for chunk in stream:
+            parts.append(chunk)
+            yield chunk.replace("\n", "  \n")
+
+    st.write_stream(markdown_chunks())
+    return "".join(parts)
+
+# Start an LLM stream and wait for its first chunk, so call_with_retries can retry a
+# failed request before anything has been rendered
+def open_stream(stream_fn, *args, **kwargs):
+    stream = stream_fn(*args, **kwargs)
+    first = next(stream, None)
+    return itertools.chain([] if first is None else [first], stream)
+
 def create_streamlit_app(llm, user_portfolio, clean_fn):
     st.set_page_config(layout="wide", page_title="AI Business Outreach", page_icon="📧")
     st.title("📧 AI Business Outreach")
@@ -104,21 +222,32 @@ def create_streamlit_app(llm, user_portfolio, clean_fn):
         if st.session_state.get("submit_triggered") and st.session_state.get("last_url"):
             url_input = st.session_state["last_url"]
         try:
-            raw_html = fetch_html_sync(url_input)
-            soup = BeautifulSoup(raw_html, "html.parser")
-            full_text = "\n".join(soup.stripped_strings)
-            cleaned_text = clean_fn(full_text)
-
-            # Try to extract relevant section and years of experience
-            relevant_sections = extract_relevant_sections(soup)
-            experience = extract_experience_years(relevant_sections or full_text)
-
-            user_portfolio.load_portfolio()  # Load portfolio if not loaded yet
-
-            jobs = try_extract_jobs(llm, cleaned_text)
-            if not jobs:
-                st.warning("⚠️ Could not extract job info. Please try again.")
-                return
+            duplicate = known_posting_stage(url_input)
+            if duplicate is not None:
+                extraction = {"jobs": duplicate["jobs"], "posting_id": duplicate["id"], "duplicate": duplicate}
+            else:
+                fetched = fetch_stage(url_input)
+                st.caption(f"Fetched via {fetched['tier']} tier ({fetched['cache']}) in {fetched['elapsed']:.1f}s")
+                parsed = parse_stage(url_input, clean_fn, load_skill_matcher(user_portfolio))
+                stats = parsed["content_stats"]
+                st.caption(
+                    f"Prompt text ({stats['method']}): {stats['input_chars']:,} → {stats['output_chars']:,} chars "
+                    f"(~{stats['input_tokens']:,} → {stats['output_tokens']:,} tokens)"
+                )
+                try:
+                    extraction = extract_stage(
+                        url_input, llm, parsed["cleaned_text"], parsed["local_skills"], parsed["confident_skills"],
+                        (parsed["title"], parsed["posting_text"]), parsed["experience"],
+                    )
+                except NoJobsExtracted:
+                    st.warning("⚠️ Could not extract job info. Please try again.")
+                    return
+            jobs, posting_id, duplicate = extraction["jobs"], extraction["posting_id"], extraction["duplicate"]
+            if duplicate is not None and canonical_job_url(duplicate["url"]) == canonical_job_url(url_input):
+                st.caption("♻️ Page unchanged since it was last processed; reusing its extraction and emails")
+            elif duplicate is not None:
+                how = "same job URL" if duplicate["match"] == "url" else f"{duplicate['similarity']:.0%} similar text"
+                st.caption(f"♻️ Seen before at {duplicate['url']} ({how}); reusing its extraction and emails")
 
             # Iterate through each detected job
             for job in jobs:
@@ -126,17 +255,27 @@ def create_streamlit_app(llm, user_portfolio, clean_fn):
                 skills = job.get("skills", [])
 
                 job["url"] = url_input
-                job["experience"] = experience
+                experience = job.get("experience", "")
 
                 # Display job header info
                 st.markdown(f"**🔎 Job Title:** <span style='color:green'>{role}</span>", unsafe_allow_html=True)
                 st.markdown(f"**🧠 Experience Required:** {experience}")
                 st.markdown(f"**🛠️ Expected Skills:** {skills}")
 
-                # Show summarized description
-                with st.spinner("Summarizing job description..."):
-                    summary = summarize_job_description(llm, cleaned_text)
+                # Show summarized description (already present with combined extraction,
+                # otherwise streamed once per URL and kept in the session)
+                summary = job.get("summary") or st.session_state.get(f"summary_{url_input}")
+                if summary:
                     st.markdown(f"📝 Job Summary: \n{summary}")
+                else:
+                    st.markdown("📝 Job Summary:")
+                    try:
+                        # A copy found before fetching is parsed only if its summary is missing
+                        cleaned_text = parse_stage(url_input, clean_fn, load_skill_matcher(user_portfolio))["cleaned_text"]
+                        st.session_state[f"summary_{url_input}"] = render_stream(call_with_retries(open_stream, llm.stream_summary, cleaned_text, method="summarize"))
+                    except Exception as e:
+                        print(f"⚠️ Summarization failed: {e}")
+                        st.markdown("Summary not available due to an error.")
 
                 if not skills:
                     st.warning(f"⚠️ No skills found for job: {role}. Portfolio links may be missing.")
@@ -146,17 +285,26 @@ def create_streamlit_app(llm, user_portfolio, clean_fn):
                 # Tone selection
                 tone = st.selectbox(
                     "✏️ Choose Email Tone:",
-                    ["Formal", "Friendly", "Concise", "Technical"],
+                    TONES,
                     key=f"tone_{job_key}"
                 )
 
                 # Query portfolio for matching examples
-                raw_links = user_portfolio.query_links(skills)
+                with get_tracer().span("retrieval", mode=RETRIEVAL_MODE):
+                    if RETRIEVAL_MODE == "hybrid":
+                        raw_links = user_portfolio.query_links_hybrid(skills, top_k=PORTFOLIO_TOP_K)
+                    else:
+                        raw_links = user_portfolio.query_links(skills, top_k=PORTFOLIO_TOP_K)
                 links = [link["links"] for link in raw_links if "links" in link]
 
                 if not links:
                     st.warning(f"⚠️ No strong match, but including job '{role}' due to partial skill overlap.")
 
+                store_key = variant_key(job_key, job, links)
+                # Duplicates mostly have their emails already, so skip background drafting
+                if PREGENERATE_TONES and duplicate is None:
+                    start_tone_variants(llm, dict(job), links, url_input, store_key, displayed_tone=tone)
+
                 # Email generation keying and regeneration logic
                 regen_key = f"regen_triggered_{job_key}"
                 stored_tone_key = f"stored_tone_{job_key}"
@@ -168,12 +316,35 @@ def create_streamlit_app(llm, user_portfolio, clean_fn):
                 if st.button("✨ Regenerate", key=f"regen_button_{job_key}"):
                     st.session_state[regen_key] = True
 
-                if tone_changed or st.session_state.get(regen_key) or email_key not in st.session_state:
-                    st.session_state[email_key] = llm.write_mail(job, links, url_input, tone=tone)
+                # Display the generated email, streaming it in when a new draft is needed
+                st.markdown(f"#### ✉️ Generated Email for {role}")
+                regenerate = bool(st.session_state.get(regen_key))
+                variant = None if regenerate else stored_variant(store_key, tone)
+                if variant is None and duplicate is not None and not regenerate:
+                    variant = get_duplicate_index().get_email(posting_id, job.get("role", ""), tone, url=url_input)
+                if variant is not None and (tone_changed or email_key not in st.session_state):
+                    # Already drafted (in the background, or for an earlier copy of the posting): switch instantly
+                    st.session_state[email_key] = variant
+                    if duplicate is None:
+                        get_duplicate_index().put_email(posting_id, job.get("role", ""), tone, variant, url=url_input)
+                    st.session_state[stored_tone_key] = tone
+                    email = variant
+                    st.markdown(email.replace("\n", "  \n"))
+                elif tone_changed or regenerate or email_key not in st.session_state:
+                    # Regenerate always bypasses the LLM response cache
+                    st.session_state[email_key] = render_stream(call_with_retries(
+                        open_stream, llm.stream_mail, job, links, url_input, tone=tone, bypass_cache=regenerate,
+                        method="write_mail",
+                    ))
+                    store_variant(store_key, tone, st.session_state[email_key])
+                    # Kept with the posting so later reposts of it can reuse the draft
+                    get_duplicate_index().put_email(posting_id, job.get("role", ""), tone, st.session_state[email_key], url=url_input)
                     st.session_state[stored_tone_key] = tone
                     st.session_state[regen_key] = False
-
-                email = st.session_state[email_key]
+                    email = st.session_state[email_key]
+                else:
+                    email = st.session_state[email_key]
+                    st.markdown(email.replace("\n", "  \n"))
 
                 # Extract subject and email body
                 subject_line_match = re.search(r"(?i)^subject\s*:\s*(.*)", email)
@@ -184,10 +355,6 @@ def create_streamlit_app(llm, user_portfolio, clean_fn):
                     subject = f"Business Opportunity - {role}"
                     email_body = email.strip()
 
-                # Display the final generated email
-                st.markdown(f"#### ✉️ Generated Email for {role}")
-                st.markdown(email.replace("\n", "  \n"))
-
                 # --- Email Sharing Buttons (Gmail, Outlook, Copy) ---
                 def generate_mail_links(subject, body):
                     encoded_subject = urllib.parse.quote(subject)
@@ -250,8 +417,32 @@ def create_streamlit_app(llm, user_portfolio, clean_fn):
         except Exception as e:
             st.error(f"An error occurred: {e}")
 
+# --- Debug Panel ---
+
+# Sidebar view of the tracer: per-stage latency, LLM tokens/cache/retries, recent
+# spans, and downloads of the JSON report and Prometheus metrics
+def render_debug_panel(tracer):
+    if not st.sidebar.checkbox("🛠️ Performance debug panel", value=os.getenv("SHOW_DEBUG_PANEL") == "1"):
+        return
+    report = tracer.report(recent_spans=25)
+    st.sidebar.markdown("**Stage latency (s)**")
+    st.sidebar.dataframe(
+        [{"stage": name, **{k: v for k, v in stats.items() if k != "total_seconds"}} for name, stats in report["stages"].items()],
+        hide_index=True,
+    )
+    st.sidebar.markdown("**LLM calls**")
+    st.sidebar.dataframe([{"method": name, **stats} for name, stats in report["llm"].items()], hide_index=True)
+    with st.sidebar.expander("Recent spans"):
+        st.json(report["spans"][::-1], expanded=False)
+    st.sidebar.download_button("⬇️ JSON report", json.dumps(report, indent=2), file_name=f"run_{report['run_id']}.json")
+    st.sidebar.download_button("⬇️ Prometheus metrics", tracer.to_prometheus(), file_name="metrics.prom")
+    if st.sidebar.button("Reset metrics"):
+        tracer.reset()
+
 # --- App Entry Point ---
 if __name__ == "__main__":
-    chain = Chain(prompt_mode="robust")  # Robust prompt includes skill/role enforcement
-    portfolio = Portfolio()              # Portfolio with tech-link mappings
-    create_streamlit_app(chain, portfolio, text_cleaner)
\ No newline at end of file
+    chain = load_chain()
+    portfolio = load_portfolio()
+    load_browser_pool()
+    create_streamlit_app(chain, portfolio, text_cleaner)
+    render_debug_panel(get_tracer())
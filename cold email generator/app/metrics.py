@@ -0,0 +1,199 @@
+import json
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Histogram bucket bounds (seconds) for stage latencies
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Prefix for every exported metric name
+METRIC_PREFIX = "outreach"
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+def _labels(**labels):
+    return "{" + ",".join(f'{k}="{str(v).replace(chr(34), chr(39))}"' for k, v in labels.items()) + "}"
+
+# Lightweight tracer for the outreach pipeline. Spans time a stage (fetch, parse,
+# clean, extract, summarize, retrieval, write_mail) with free-form attributes such
+# as the fetch tier or readiness reason; LLM calls also record prompt/completion
+# tokens, cache hits and retries. Totals are exact; percentiles and the span log
+# use the most recent `max_samples` entries.
+class Tracer:
+    def __init__(self, max_samples=10000, max_spans=1000):
+        self.max_samples = max_samples
+        self.max_spans = max_spans
+        self._lock = threading.Lock()
+        self.reset()
+
+    # Start a new run: clears every span, counter and sample (under the lock, since
+    # background threads may be recording meanwhile)
+    def reset(self):
+        with self._lock:
+            self.run_id = uuid.uuid4().hex[:12]
+            self.started_at = time.time()
+            self._counts = Counter()  # stage → spans
+            self._totals = Counter()  # stage → seconds
+            self._errors = Counter()  # stage → failed spans
+            self._buckets = defaultdict(lambda: [0] * len(LATENCY_BUCKETS))
+            self._samples = defaultdict(lambda: deque(maxlen=self.max_samples))
+            self._spans = deque(maxlen=self.max_spans)
+            self.tokens = Counter()  # (method, "prompt" | "completion") → tokens
+            self.cache = Counter()  # (method, "hit" | "miss" | "off") → LLM calls; "off" when no cache is configured
+            self.retries = Counter()  # method → retried LLM calls
+
+    # Record a finished span of `seconds`
+    def record(self, name, seconds, error=None, **attrs):
+        with self._lock:
+            self._counts[name] += 1
+            self._totals[name] += seconds
+            if error is not None:
+                self._errors[name] += 1
+            buckets = self._buckets[name]
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    buckets[index] += 1
+            self._samples[name].append(seconds)
+            span = {"name": name, "at": round(time.time() - seconds, 3), "seconds": round(seconds, 4)}
+            span.update(attrs)
+            if error is not None:
+                span["error"] = error
+            self._spans.append(span)
+
+    # Time the enclosed block. The yielded dict collects attributes set inside the
+    # block (e.g., attrs["tier"] = "browser"); a raised exception marks the span failed.
+    @contextmanager
+    def span(self, name, **attrs):
+        start = time.perf_counter()
+        try:
+            yield attrs
+        except Exception as e:
+            self.record(name, time.perf_counter() - start, error=type(e).__name__, **attrs)
+            raise
+        self.record(name, time.perf_counter() - start, **attrs)
+
+    # Record sub-stage timings measured elsewhere (e.g., prepare_page's `timings`)
+    def record_timings(self, timings, **attrs):
+        for name, seconds in timings.items():
+            self.record(name, seconds, **attrs)
+
+    def record_llm_call(self, method, prompt_tokens=0, completion_tokens=0, cache="off"):
+        with self._lock:
+            self.tokens[(method, "prompt")] += prompt_tokens
+            self.tokens[(method, "completion")] += completion_tokens
+            self.cache[(method, cache)] += 1
+
+    def record_retry(self, method):
+        with self._lock:
+            self.retries[method] += 1
+
+    # Per-run summary: stage latencies, LLM usage and the most recent spans
+    def report(self, recent_spans=200):
+        with self._lock:
+            stages = {
+                name: {
+                    "count": count,
+                    "errors": self._errors[name],
+                    "total_seconds": round(self._totals[name], 4),
+                    "p50": round(percentile(self._samples[name], 0.50), 4),
+                    "p95": round(percentile(self._samples[name], 0.95), 4),
+                    "max": round(max(self._samples[name], default=0.0), 4),
+                }
+                for name, count in sorted(self._counts.items())
+            }
+            methods = sorted({m for m, _ in self.tokens} | {m for m, _ in self.cache} | set(self.retries))
+            llm = {
+                method: {
+                    "prompt_tokens": self.tokens[(method, "prompt")],
+                    "completion_tokens": self.tokens[(method, "completion")],
+                    "cache_hits": self.cache[(method, "hit")],
+                    "cache_misses": self.cache[(method, "miss")],
+                    "uncached": self.cache[(method, "off")],
+                    "retries": self.retries[method],
+                }
+                for method in methods
+            }
+            spans = list(self._spans)[-recent_spans:] if recent_spans else []
+        return {
+            "run_id": self.run_id,
+            "started_at": self.started_at,
+            "elapsed_seconds": round(time.time() - self.started_at, 3),
+            "stages": stages,
+            "llm": llm,
+            "spans": spans,
+        }
+
+    def write_report(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=2)
+
+    # Prometheus text exposition format (version 0.0.4)
+    def to_prometheus(self):
+        name = f"{METRIC_PREFIX}_stage_duration_seconds"
+        lines = [f"# HELP {name} Pipeline stage latency.", f"# TYPE {name} histogram"]
+        with self._lock:
+            for stage in sorted(self._counts):
+                for bound, count in zip(LATENCY_BUCKETS, self._buckets[stage]):
+                    lines.append(f"{name}_bucket{_labels(stage=stage, le=bound)} {count}")
+                lines.append(f"{name}_bucket{_labels(stage=stage, le='+Inf')} {self._counts[stage]}")
+                lines.append(f"{name}_sum{_labels(stage=stage)} {self._totals[stage]:.6f}")
+                lines.append(f"{name}_count{_labels(stage=stage)} {self._counts[stage]}")
+            counters = [
+                ("stage_errors_total", "Failed pipeline stage spans.", [((stage,), n) for stage, n in self._errors.items()], ("stage",)),
+                ("llm_tokens_total", "LLM tokens by method and kind.", list(self.tokens.items()), ("method", "kind")),
+                ("llm_cache_requests_total", "LLM calls by method and cache result.", list(self.cache.items()), ("method", "result")),
+                ("llm_retries_total", "Retried LLM calls by method.", [((method,), n) for method, n in self.retries.items()], ("method",)),
+            ]
+            for metric, help_text, items, label_names in counters:
+                metric = f"{METRIC_PREFIX}_{metric}"
+                lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+                for key, value in sorted(items):
+                    key = key if isinstance(key, tuple) else (key,)
+                    lines.append(f"{metric}{_labels(**dict(zip(label_names, key)))} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+
+
+# --- Process-wide tracer ---
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+def get_tracer():
+    global _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            _tracer = Tracer()
+        return _tracer
+
+# Serve the shared tracer's Prometheus text at http://<host>:<port>/metrics from a
+# daemon thread (for scraping long batch runs). Returns the server; call shutdown() to stop.
+def start_metrics_server(port, host="127.0.0.1"):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = get_tracer().to_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass  # Keep scrapes out of the batch output
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,126 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from utils import normalize_url
+
+# Persistent, size-bounded page cache keyed by a hash of the normalized URL.
+# Bodies are stored zlib-compressed alongside the fetch metadata needed for
+# conditional revalidation (ETag / Last-Modified) and the tier that served them.
+class PageCache:
+    def __init__(self, path="cache/page_cache.sqlite3", ttl=24 * 3600, max_bytes=256 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl  # Seconds before an entry must be revalidated
+        self.max_bytes = max_bytes  # Upper bound on stored (compressed) bytes
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS pages (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                tier TEXT
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS pages_last_access ON pages (last_access)")
+        self._conn.commit()
+
+    @staticmethod
+    def key_for(url):
+        return hashlib.sha256(normalize_url(url).encode("utf-8")).hexdigest()
+
+    # Return the cached entry (with a `fresh` flag) or None; refreshes its LRU position
+    def get(self, url):
+        key = self.key_for(url)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT url, body, fetched_at, etag, last_modified, tier FROM pages WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE pages SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        url, body, fetched_at, etag, last_modified, tier = row
+        return {
+            "url": url,
+            "content": zlib.decompress(body).decode("utf-8"),
+            "fetched_at": fetched_at,
+            "etag": etag,
+            "last_modified": last_modified,
+            "tier": tier,
+            "fresh": now - fetched_at < self.ttl,
+        }
+
+    # Store a fetch result from fetcher.fetch_page_async
+    def put(self, url, result):
+        body = zlib.compress(result["content"].encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages (key, url, body, size, fetched_at, last_access, etag, last_modified, tier) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (self.key_for(url), normalize_url(url), body, len(body), now, now,
+                 result.get("etag"), result.get("last_modified"), result.get("tier")),
+            )
+            self._evict()
+            self._conn.commit()
+
+    # Mark an entry as revalidated (server answered 304 Not Modified)
+    def touch(self, url):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE pages SET fetched_at = ?, last_access = ? WHERE key = ?", (now, now, self.key_for(url))
+            )
+            self._conn.commit()
+
+    # Drop least-recently-used entries until the store fits in max_bytes
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute("SELECT key, size FROM pages ORDER BY last_access").fetchall():
+            self._conn.execute("DELETE FROM pages WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def stats(self):
+        with self._lock:
+            count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM pages").fetchone()
+        return {"entries": count, "bytes": total, "max_bytes": self.max_bytes, "ttl": self.ttl}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# --- Process-wide cache ---
+
+_cache = None
+_cache_lock = threading.Lock()
+
+# Return the shared page cache (path/TTL overridable via PAGE_CACHE_PATH / PAGE_CACHE_TTL)
+def get_page_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = PageCache(
+                path=os.getenv("PAGE_CACHE_PATH", "cache/page_cache.sqlite3"),
+                ttl=float(os.getenv("PAGE_CACHE_TTL", 24 * 3600)),
+            )
+        return _cache
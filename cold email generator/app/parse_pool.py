@@ -0,0 +1,58 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from preprocessing import prepare_page
+from skill_matcher import SkillMatcher
+
+# Skill matcher of the current worker process, built once by the pool initializer
+_worker_matcher = None
+
+def _init_worker(vocabulary):
+    global _worker_matcher
+    _worker_matcher = SkillMatcher(vocabulary) if vocabulary else None
+
+# Runs in a worker process. Only the HTML goes in and only prepare_page's compact
+# dict (cleaned text, experience, local skills, size stats) comes back; the soup
+# never crosses the process boundary.
+def _prepare_in_worker(html):
+    return prepare_page(html, skill_matcher=_worker_matcher)
+
+def _worker_ready():
+    return os.getpid()
+
+# Process pool for the CPU-bound parse stage (BeautifulSoup, scanning, cleaning,
+# experience and skill matching), so parsing scales with cores instead of blocking
+# the event loop that drives fetches and LLM calls. At most `workers + queue_size`
+# pages are submitted at once; further callers wait in prepare(), which pushes
+# back on the fetch stage instead of buffering HTML without bound.
+class ParsePool:
+    def __init__(self, workers=None, queue_size=None, vocabulary=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = self.workers * 2 if queue_size is None else queue_size
+        # spawn: forking a process that already runs the browser/event-loop threads is unsafe
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(vocabulary,),
+        )
+        self._slots = asyncio.Semaphore(self.workers + self.queue_size)
+
+    # Spawn every worker (interpreter start-up, imports, skill matcher) before pages
+    # arrive, so that one-off cost is not charged to the first pages. Returns seconds.
+    async def start(self):
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self._executor, _worker_ready) for _ in range(self.workers)))
+        return time.perf_counter() - start
+
+    async def prepare(self, html):
+        async with self._slots:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, _prepare_in_worker, html)
+
+    def close(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
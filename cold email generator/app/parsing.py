@@ -0,0 +1,223 @@
+import re
+from bs4 import BeautifulSoup, CData, NavigableString, Tag
+
+from utils import JOB_SECTION_KEYWORDS, estimate_tokens
+
+# Prefer lxml's C parser when installed; html.parser is the pure-Python fallback
+try:
+    import lxml  # noqa: F401
+    DEFAULT_PARSER = "lxml"
+except ImportError:
+    DEFAULT_PARSER = "html.parser"
+
+# Containers considered as job sections by scan_page
+SECTION_TAGS = {"section", "div"}
+
+# Pre-compiled job-section keyword matcher
+JOB_SECTION_RE = re.compile(JOB_SECTION_KEYWORDS, re.IGNORECASE)
+
+# Longest string still treated as a bare section heading ("Qualifications:")
+MAX_HEADING_CHARS = 60
+
+def parse_html(html, parser=None):
+    return BeautifulSoup(html, parser or DEFAULT_PARSER)
+
+# Single pass over the tree that yields both the page's stripped strings and its
+# job-relevant sections. Every text node is visited once; each section/div only
+# records its [start, end) range into the shared string list, and a prefix sum of
+# keyword hits tells in O(1) whether that range mentions a job-section keyword.
+# Only the innermost matching sections are kept, so no ancestor text is repeated.
+# A section holding nothing but its heading (`<div><h3>Qualifications</h3></div>`
+# followed by a sibling list) does not count, so its container is kept instead.
+def scan_page(soup):
+    strings = []
+    hits = [0]  # hits[i] = keyword matches among strings[:i]
+    sections = []  # (start, end) of innermost matching sections
+    open_tags = []  # [start, has_matching_descendant] per tag on the current path
+    stack = [(soup, True)]
+    while stack:
+        node, entering = stack.pop()
+        if not entering:
+            start, has_match_below = open_tags.pop()
+            end = len(strings)
+            matched = node.name in SECTION_TAGS and hits[end] > hits[start]
+            if matched and end - start == 1 and len(strings[start]) <= MAX_HEADING_CHARS:
+                matched = False  # Just a heading wrapper
+            if matched and not has_match_below:
+                sections.append((start, end))
+            if (matched or has_match_below) and open_tags:
+                open_tags[-1][1] = True
+            continue
+        if isinstance(node, Tag):
+            open_tags.append([len(strings), False])
+            stack.append((node, False))
+            stack.extend((child, True) for child in reversed(node.contents))
+        elif type(node) in (NavigableString, CData):  # Skips comments, scripts and styles
+            text = node.strip()
+            if text:
+                strings.append(text)
+                hits.append(hits[-1] + (1 if JOB_SECTION_RE.search(text) else 0))
+
+    return {
+        "full_text": "\n".join(strings),
+        "relevant_sections": "\n".join("\n".join(strings[start:end]) for start, end in sorted(sections)),
+    }
+
+# Extract job-relevant sections (Qualifications/Responsibilities)
+def extract_relevant_sections(soup):
+    return scan_page(soup)["relevant_sections"]
+
+# Tags that never hold the job posting itself
+BOILERPLATE_TAGS = {"nav", "header", "footer", "aside", "script", "style", "noscript", "form", "iframe", "svg", "button", "template"}
+
+# id/class fragments typical of cookie banners, menus and "similar jobs" rails
+BOILERPLATE_HINTS = re.compile(
+    r"cookie|consent|gdpr|banner|footer|header|navbar|nav-|menu|sidebar|breadcrumb|related|similar|recommend|"
+    r"share|social|newsletter|subscribe|modal|popup|promo|advert",
+    re.IGNORECASE,
+)
+
+# Elements whose text counts as body content when scoring
+TEXT_BLOCK_TAGS = {"p", "li", "td", "dd", "pre", "blockquote", "h1", "h2", "h3", "h4", "h5", "h6"}
+HEADING_TAGS = {"h1", "h2", "h3", "h4", "h5", "h6", "strong", "b"}
+
+# Bonus for a container holding a Qualifications/Responsibilities-style heading
+SECTION_HEADING_BONUS = 25.0
+
+# Minimum characters for the extracted block to be trusted over the full page
+MIN_CONTENT_CHARS = 200
+
+# True for nodes that look like navigation, banners or other page chrome
+def is_boilerplate(node):
+    if node.name in BOILERPLATE_TAGS:
+        return True
+    if node.get("role") in ("navigation", "banner", "contentinfo", "dialog"):
+        return True
+    hints = " ".join(node.get("class") or []) + " " + (node.get("id") or "")
+    return bool(hints.strip()) and bool(BOILERPLATE_HINTS.search(hints))
+
+# Visible strings under `node`, skipping boilerplate subtrees (stack-based, so deep
+# nesting cannot hit the recursion limit)
+def content_strings(node):
+    stack = list(reversed(node.contents))
+    while stack:
+        child = stack.pop()
+        if isinstance(child, Tag):
+            if not is_boilerplate(child):
+                stack.extend(reversed(child.contents))
+        elif type(child) is NavigableString:
+            text = child.strip()
+            if text:
+                yield text
+
+# Readability-style density scoring: each text block scores by length and commas
+# (discounted by link density) and propagates to its parent and, halved, to its
+# grandparent. Job-section headings boost their containers. Like scan_page this is
+# one stack-based pass: every visible string is visited once and feeds prefix sums
+# (characters, commas, characters inside links, keyword hits), so a block's stats
+# are the difference between its start and end instead of a walk of its subtree.
+def score_candidates(root):
+    scores = {}
+
+    def add(node, amount):
+        if isinstance(node, Tag) and node is not root:
+            scores[id(node)] = (node, scores.get(id(node), (node, 0.0))[1] + amount)
+
+    chars, commas, link_chars, hits = [0], [0], [0], [0]
+    starts = []  # Index of the first string of each tag on the current path
+    links_open = 0
+    stack = [(child, True) for child in reversed(root.contents)]
+    while stack:
+        node, entering = stack.pop()
+        if not entering:
+            start = starts.pop()
+            if node.name == "a":
+                links_open -= 1
+            if node.name in TEXT_BLOCK_TAGS or node.name in HEADING_TAGS:
+                count = len(chars) - 1 - start
+                length = chars[-1] - chars[start] + max(count - 1, 0)  # As " ".join(strings)
+                if node.name in HEADING_TAGS and hits[-1] > hits[start]:
+                    add(node.parent, SECTION_HEADING_BONUS)
+                    add(node.parent.parent, SECTION_HEADING_BONUS / 2)
+                elif length >= 25:
+                    link_density = (link_chars[-1] - link_chars[start]) / max(length, 1)
+                    score = (1 + commas[-1] - commas[start] + min(length / 100, 3)) * (1 - link_density)
+                    add(node.parent, score)
+                    add(node.parent.parent, score / 2)
+            continue
+        if isinstance(node, Tag):
+            if is_boilerplate(node):
+                continue
+            starts.append(len(chars) - 1)
+            if node.name == "a":
+                links_open += 1
+            stack.append((node, False))
+            stack.extend((child, True) for child in reversed(node.contents))
+        elif type(node) is NavigableString:
+            text = node.strip()
+            if text:
+                chars.append(chars[-1] + len(text))
+                commas.append(commas[-1] + text.count(","))
+                link_chars.append(link_chars[-1] + (len(text) if links_open else 0))
+                hits.append(hits[-1] + (1 if JOB_SECTION_RE.search(text) else 0))
+
+    return scores.values()
+
+# Isolate the job-posting block before clean_text. Picks the best-scoring container
+# plus siblings scoring at least 20% of it, and falls back to the whole page when
+# the winner is too small. Reports input vs. output character and token counts.
+def extract_main_content(soup, min_chars=MIN_CONTENT_CHARS, full_text=None):
+    root = soup.body or soup
+    if full_text is None:  # Pass scan_page's full_text to avoid another walk
+        full_text = "\n".join(soup.stripped_strings)
+    candidates = sorted(score_candidates(root), key=lambda item: item[1], reverse=True)
+
+    text, method = full_text, "full_page"
+    if candidates:
+        best, best_score = candidates[0]
+        siblings = best.parent.find_all(recursive=False) if best.parent else [best]
+        threshold = best_score * 0.2
+        candidate_scores = {id(node): score for node, score in candidates}
+        blocks = [
+            node for node in siblings
+            if node is best or candidate_scores.get(id(node), 0.0) >= threshold
+        ]
+        extracted = "\n".join(s for node in blocks for s in content_strings(node))
+        if len(extracted) >= min_chars:
+            text, method = extracted, "main_content"
+
+    return {
+        "text": text,
+        "method": method,
+        "input_chars": len(full_text),
+        "output_chars": len(text),
+        "input_tokens": estimate_tokens(full_text),
+        "output_tokens": estimate_tokens(text),
+    }
+
+# Lists carrying fewer words than this are too thin to identify a posting on their own
+MIN_POSTING_LIST_WORDS = 50
+
+# The posting's own parts, for near-duplicate detection: its title (first <h1>, else
+# <title>) and the text that tells one role from another. Companies reuse "About us",
+# benefits and culture prose across every posting, while responsibilities and
+# requirements are list items, so the text is the title plus the list items outside
+# page chrome; pages with too little list text fall back to `fallback_text`.
+def posting_parts(soup, fallback_text=""):
+    heading = soup.find("h1") or soup.find("title")
+    title = heading.get_text(" ", strip=True) if heading else ""
+    items = []
+    stack = [soup]  # Boilerplate subtrees are skipped whole instead of checking each item's parents
+    while stack:
+        node = stack.pop()
+        if is_boilerplate(node):
+            continue
+        if node.name == "li":
+            text = node.get_text(" ", strip=True)
+            if text:
+                items.append(text)
+        stack.extend(reversed(node.find_all(recursive=False)))
+    text = "\n".join(items)
+    if len(text.split()) < MIN_POSTING_LIST_WORDS:
+        text = fallback_text
+    return {"title": title, "text": f"{title}\n{text}" if title else text}
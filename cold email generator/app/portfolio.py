@@ -1,47 +1,211 @@
+import hashlib
+import heapq
+import os
+import time
 import pandas as pd
 import chromadb
-import uuid
+from chromadb.utils import embedding_functions
+from collections import OrderedDict, defaultdict
+
+from utils import normalize_skill
+
+# Canonical lookup key for a skill (e.g., 'k8s ' → 'kubernetes', 'Node.js' → 'node.js')
+def skill_key(skill):
+    return normalize_skill(str(skill)).lower()
 
 class Portfolio:
-    def __init__(self, file_path="app/resource/company_portfolio.csv"):
+    def __init__(self, file_path="app/resource/company_portfolio.csv", sync_batch_size=256, embedding_cache_size=4096):
         # Initialize the Portfolio class with file path and ChromaDB setup
         self.file_path = file_path
-        self.data = pd.read_csv(file_path)  # Load portfolio CSV into DataFrame
+        self.sync_batch_size = sync_batch_size  # Rows per ChromaDB upsert/delete call
+        self.data = None
+        self._mtime = None
+        self.skill_index = {}  # Canonical skill → list of portfolio row positions
+        self.row_links = []  # Row position → link
+        self.techstack_terms = set()  # Every distinct Techstack entry, as written in the CSV
+        self._load_data()  # Load portfolio CSV into DataFrame and build the skill index
         self.chroma_client = chromadb.PersistentClient('vectorstore')  # Initialize ChromaDB persistent client
-        self.collection = self.chroma_client.get_or_create_collection(name="portfolio")  # Get or create collection
+        # Embed skills ourselves (batched + cached) with the collection's own embedding model
+        self.embedding_function = embedding_functions.DefaultEmbeddingFunction()
+        self.collection = self.chroma_client.get_or_create_collection(
+            name="portfolio", embedding_function=self.embedding_function
+        )  # Get or create collection
+        self.embedding_cache_size = embedding_cache_size
+        self._embedding_cache = OrderedDict()  # Canonical skill → embedding (LRU)
+
+    def _load_data(self):
+        self._mtime = os.path.getmtime(self.file_path)
+        self.data = pd.read_csv(self.file_path)
+        self._build_index()
+
+    # Build the skill → rows inverted index once per CSV load
+    def _build_index(self):
+        index = defaultdict(list)
+        self.row_links = [str(link) for link in self.data["Links"]]
+        terms = set()
+        for position, techstack in enumerate(self.data["Techstack"]):
+            row_terms = {s.strip() for s in str(techstack).split(",") if s.strip()}
+            terms.update(row_terms)
+            for skill in {skill_key(s) for s in row_terms}:
+                index[skill].append(position)
+        self.skill_index = dict(index)
+        self.techstack_terms = terms
+
+    # Reload the CSV (rebuild the index, re-sync the vector store) if it changed on disk
+    def refresh_if_changed(self):
+        if os.path.getmtime(self.file_path) != self._mtime:
+            self._load_data()
+            self.sync_vectorstore()
+            return True
+        return False
+
+    # Deterministic vector-store records for the current CSV: id → (document, metadata).
+    # Ids hash the row's link (plus an occurrence counter for repeated links), and the
+    # metadata carries a hash of the tech stack so edited rows are detected as updates.
+    def _portfolio_records(self):
+        records = {}
+        seen = defaultdict(int)
+        for techstack, link in zip(self.data["Techstack"], self.row_links):
+            techstack = str(techstack)  # Ensure tech stack is string
+            occurrence = seen[link]
+            seen[link] += 1
+            doc_id = hashlib.sha1(f"{link}#{occurrence}".encode("utf-8")).hexdigest()
+            content_hash = hashlib.sha1(techstack.encode("utf-8")).hexdigest()
+            records[doc_id] = (techstack, {"links": link, "content_hash": content_hash})
+        return records
+
+    # Current content hash of every document in the collection, read in pages
+    def _existing_hashes(self):
+        existing = {}
+        offset = 0
+        while True:
+            page = self.collection.get(include=["metadatas"], limit=self.sync_batch_size, offset=offset)
+            for doc_id, metadata in zip(page["ids"], page["metadatas"]):
+                existing[doc_id] = (metadata or {}).get("content_hash")
+            if len(page["ids"]) < self.sync_batch_size:
+                return existing
+            offset += len(page["ids"])
+
+    # Incrementally sync the CSV into ChromaDB: diff against the collection, then
+    # batch-upsert new/changed rows and batch-delete rows no longer in the CSV.
+    # Returns counts and timing; a no-op when the CSV digest is unchanged.
+    def sync_vectorstore(self):
+        start = time.perf_counter()
+        records = self._portfolio_records()
+        digest = hashlib.sha1("".join(sorted(
+            doc_id + meta["content_hash"] for doc_id, (_, meta) in records.items()
+        )).encode("utf-8")).hexdigest()
+        report = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+
+        collection_meta = self.collection.metadata or {}
+        if collection_meta.get("portfolio_digest") == digest and self.collection.count() == len(records):
+            report["unchanged"] = len(records)
+            report["seconds"] = time.perf_counter() - start
+            return report
+
+        existing = self._existing_hashes()
+        to_upsert = []
+        for doc_id, (_, meta) in records.items():
+            if doc_id not in existing:
+                report["added"] += 1
+                to_upsert.append(doc_id)
+            elif existing[doc_id] != meta["content_hash"]:
+                report["updated"] += 1
+                to_upsert.append(doc_id)
+            else:
+                report["unchanged"] += 1
+        to_delete = [doc_id for doc_id in existing if doc_id not in records]
+        report["removed"] = len(to_delete)
+
+        for i in range(0, len(to_delete), self.sync_batch_size):
+            self.collection.delete(ids=to_delete[i:i + self.sync_batch_size])
+        for i in range(0, len(to_upsert), self.sync_batch_size):
+            batch = to_upsert[i:i + self.sync_batch_size]
+            self.collection.upsert(
+                ids=batch,
+                documents=[records[doc_id][0] for doc_id in batch],
+                metadatas=[records[doc_id][1] for doc_id in batch],
+            )
+
+        # Record the digest so the next startup can skip the diff (index settings can't be re-sent)
+        user_meta = {k: v for k, v in collection_meta.items() if not k.startswith("hnsw:")}
+        self.collection.modify(metadata={**user_meta, "portfolio_digest": digest})
+        report["seconds"] = time.perf_counter() - start
+        return report
 
     def load_portfolio(self):
-        # Load portfolio into vector store if collection is empty
-        if not self.collection.count():
-            for _, row in self.data.iterrows():
-                techstack = str(row["Techstack"])  # Ensure tech stack is string
-                link = str(row["Links"])  # Ensure link is string
-
-                # Add document to ChromaDB with metadata
-                self.collection.add(
-                    documents=[techstack],
-                    metadatas=[{"links": link}],  # Metadata must be list of dicts
-                    ids=[str(uuid.uuid4())]  # Unique ID for each document
-                )
-
-    def query_links(self, skills):
+        # Bring the vector store in line with the CSV (no-op when nothing changed)
+        report = self.sync_vectorstore()
+        if report["added"] or report["updated"] or report["removed"]:
+            print(f"📚 Portfolio sync: +{report['added']} ~{report['updated']} -{report['removed']} "
+                  f"in {report['seconds']:.2f}s")
+        return report
+
+    def query_links(self, skills, top_k=None):
         # Return early if no skills provided
         if not skills:
             print("⚠️ Warning: No skills found for job, skipping portfolio query.")
             return []
 
-        # Normalize incoming skills (e.g., 'Python ' → 'python')
-        normalized_skills = set(s.lower().strip() for s in skills)
+        self.refresh_if_changed()
+
+        # Canonicalize incoming skills (e.g., 'JS ' → 'javascript')
+        normalized_skills = {skill_key(s) for s in skills if str(s).strip()}
+
+        # Count skill overlap per portfolio row via the inverted index
+        scores = defaultdict(int)
+        for skill in normalized_skills:
+            for position in self.skill_index.get(skill, ()):
+                scores[position] += 1
+
+        # Highest overlap first; ties keep portfolio order
+        rank_key = lambda item: (-item[1], item[0])
+        if top_k is None:
+            ranked = sorted(scores.items(), key=rank_key)
+        else:
+            ranked = heapq.nsmallest(top_k, scores.items(), key=rank_key)
+        return [{"links": self.row_links[position], "score": score} for position, score in ranked]
+
+    # Embed skills in one batched call, reusing cached embeddings for repeated skills
+    def embed_skills(self, skills):
+        missing = [skill for skill in skills if skill not in self._embedding_cache]
+        if missing:
+            for skill, embedding in zip(missing, self.embedding_function(missing)):
+                self._embedding_cache[skill] = embedding
+        embeddings = []
+        for skill in skills:
+            self._embedding_cache.move_to_end(skill)
+            embeddings.append(self._embedding_cache[skill])
+        while len(self._embedding_cache) > self.embedding_cache_size:
+            self._embedding_cache.popitem(last=False)
+        return embeddings
+
+    # Hybrid retrieval: one batched embedding call and one collection query for all of a
+    # job's skills (n_results per skill), fused with the lexical overlap ranking from
+    # query_links via reciprocal rank fusion. Returns de-duplicated top-k links.
+    def query_links_hybrid(self, skills, top_k=8, n_results=5, rrf_k=60):
+        if not skills:
+            print("⚠️ Warning: No skills found for job, skipping portfolio query.")
+            return []
 
-        matched_links = []
+        fused = defaultdict(float)
 
-        # Check each row of the portfolio for skill overlap
-        for _, row in self.data.iterrows():
-            # Normalize skills listed in the portfolio
-            portfolio_skills = [s.lower().strip() for s in row["Techstack"].split(",")]
+        # Lexical ranking (exact canonical-skill overlap)
+        for rank, match in enumerate(self.query_links(skills)):
+            fused[match["links"]] += 1.0 / (rrf_k + rank + 1)
 
-            # If any overlap, include the corresponding link
-            if normalized_skills.intersection(portfolio_skills):
-                matched_links.append({"links": row["Links"]})
+        # Vector ranking, one result list per skill
+        query_skills = list(dict.fromkeys(normalize_skill(str(s)) for s in skills if str(s).strip()))
+        n_results = min(n_results, self.collection.count())
+        if query_skills and n_results:
+            results = self.collection.query(
+                query_embeddings=self.embed_skills(query_skills),
+                n_results=n_results,
+                include=["metadatas"],
+            )
+            for metadatas in results["metadatas"]:
+                for rank, metadata in enumerate(metadatas):
+                    fused[metadata["links"]] += 1.0 / (rrf_k + rank + 1)
 
-        return matched_links
\ No newline at end of file
+        ranked = heapq.nlargest(top_k, fused.items(), key=lambda item: item[1])
+        return [{"links": link, "score": score} for link, score in ranked]
@@ -0,0 +1,65 @@
+import re
+import time
+
+from parsing import extract_main_content, parse_html, posting_parts, scan_page
+from utils import clean_text
+
+# Every "N years" / "N+ yrs" mention. The old per-pattern regexes (minimum of N years,
+# N years of ... experience, experience ... N years, N years in/technical ...) all
+# captured a number directly followed by years/yrs, so one linear scan finds the same
+# numbers without the `.*` backtracking.
+EXPERIENCE_RE = re.compile(r"(\d+)\+?\s*(?:years?|yrs?)\b", re.IGNORECASE)
+
+# All experience mentions with their source spans, in order of appearance
+def find_experience_mentions(text):
+    return [
+        {"years": int(m.group(1)), "span": m.span(), "text": m.group(0)}
+        for m in EXPERIENCE_RE.finditer(text)
+    ]
+
+# Try to extract number of years of experience mentioned (the largest one)
+def extract_experience_years(text):
+    mentions = find_experience_mentions(text)
+    return f"{max(m['years'] for m in mentions)} years" if mentions else "Not specified"
+
+# Clean the prompt text and scan for experience in one call. Experience is read from
+# the raw text (the job sections when available), because cleaning strips newlines
+# and would glue "years" onto the next word.
+def preprocess(text, sections=None, clean_fn=clean_text):
+    mentions = find_experience_mentions(sections or text)
+    if not mentions and sections:
+        mentions = find_experience_mentions(text)  # Sections missed the requirements list
+    return {
+        "cleaned_text": clean_fn(text),
+        "experience_mentions": mentions,
+        "experience": f"{max(m['years'] for m in mentions)} years" if mentions else "Not specified",
+    }
+
+# Full parse stage for one fetched page, shared by the Streamlit app and the batch
+# CLI: one tree walk for the text and job sections, boilerplate stripping, cleaning,
+# experience, and local skill matching on the raw text (so 'C++' and 'Node.js' survive).
+# The job sections the experience was read from are returned as `sections`.
+# `timings` holds seconds per sub-stage (parse, clean, skills) for the tracer; they are
+# returned rather than recorded here because this may run in a worker process.
+def prepare_page(html, clean_fn=clean_text, skill_matcher=None):
+    start = time.perf_counter()
+    soup = parse_html(html)
+    scanned = scan_page(soup)
+    main_content = extract_main_content(soup, full_text=scanned["full_text"])
+    # Title and role-specific text for duplicate detection (dedup.DuplicateIndex)
+    posting = posting_parts(soup, fallback_text=main_content["text"])
+    parsed_at = time.perf_counter()
+    sections = scanned["relevant_sections"] or scanned["full_text"]
+    prepared = preprocess(main_content["text"], sections=sections, clean_fn=clean_fn)
+    cleaned_at = time.perf_counter()
+    prepared["content_stats"] = {k: v for k, v in main_content.items() if k != "text"}
+    prepared["sections"] = sections  # Qualifications/Responsibilities text (the full page text when none)
+    prepared["title"], prepared["posting_text"] = posting["title"], posting["text"]
+    local = skill_matcher.extract_with_confidence(main_content["text"]) if skill_matcher else {"skills": [], "confident": []}
+    prepared["local_skills"], prepared["confident_skills"] = local["skills"], local["confident"]
+    prepared["timings"] = {
+        "parse": parsed_at - start,
+        "clean": cleaned_at - parsed_at,
+        "skills": time.perf_counter() - cleaned_at,
+    }
+    return prepared
@@ -0,0 +1,67 @@
+import asyncio
+import time
+from playwright.async_api import Error as PlaywrightError
+
+from utils import JOB_SECTION_KEYWORDS
+
+# Resolves true once the DOM has had no mutations for `quietMs`, or false after `maxMs`
+DOM_SETTLED_JS = """
+([quietMs, maxMs]) => new Promise(resolve => {
+    const observer = new MutationObserver(() => { clearTimeout(quiet); quiet = setTimeout(() => done(true), quietMs); });
+    let quiet = setTimeout(() => done(true), quietMs);
+    const limit = setTimeout(() => done(false), maxMs);
+    function done(settled) {
+        observer.disconnect();
+        clearTimeout(quiet);
+        clearTimeout(limit);
+        resolve(settled);
+    }
+    observer.observe(document.documentElement, {childList: true, subtree: true, characterData: true});
+})
+"""
+
+# Truthy once the visible body text contains a job-section heading
+JOB_CONTENT_JS = """
+(pattern) => document.body && new RegExp(pattern, "i").test(document.body.innerText)
+"""
+
+# Wait until the page looks ready, whichever comes first:
+#   - "job_content":  a Qualifications/Responsibilities-style heading is visible
+#   - "network_idle": no network connections for 500 ms
+#   - "dom_settled":  no DOM mutations for `quiet_ms`
+#   - "timeout":      none of the above within `max_wait` seconds (hard upper bound)
+# Returns (reason, elapsed_seconds).
+async def wait_for_page_ready(page, max_wait=8.0, quiet_ms=500):
+    start = time.perf_counter()
+    timeout_ms = max_wait * 1000
+    checks = {
+        "job_content": page.wait_for_function(JOB_CONTENT_JS, arg=JOB_SECTION_KEYWORDS, polling=250, timeout=timeout_ms),
+        "network_idle": page.wait_for_load_state("networkidle", timeout=timeout_ms),
+        "dom_settled": page.evaluate(DOM_SETTLED_JS, [quiet_ms, timeout_ms]),
+    }
+    tasks = {asyncio.ensure_future(check): name for name, check in checks.items()}
+    pending = set(tasks)
+    reason = "timeout"
+    try:
+        while pending and reason == "timeout":
+            remaining = max_wait - (time.perf_counter() - start)
+            if remaining <= 0:
+                break
+            done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                # Failed checks (e.g., Playwright timeouts) and an unsettled DOM don't count
+                if task.exception() is None and task.result() is not False:
+                    reason = tasks[task]
+                    break
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    return reason, time.perf_counter() - start
+
+# Short, bounded settle after scrolling so lazy-loaded sections can render
+async def settle_after_scroll(page, quiet_ms=250, max_wait=1.5):
+    try:
+        return await page.evaluate(DOM_SETTLED_JS, [quiet_ms, max_wait * 1000])
+    except PlaywrightError:
+        return False
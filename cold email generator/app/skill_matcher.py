@@ -0,0 +1,148 @@
+from collections import deque
+
+from utils import SKILL_SYNONYMS
+
+try:
+    import ahocorasick  # Optional C implementation (pyahocorasick)
+except ImportError:
+    ahocorasick = None
+
+# Terms (synonym keys or portfolio entries) that are ordinary English words or too
+# short to match safely in prose; single characters ("C", "R") are dropped as well
+AMBIGUOUS_TERMS = {
+    "go", "ci", "cd", "ts", "rb", "chef", "spring", "express", "swift", "ember", "puppet", "hive",
+    "testing", "room", "segment", "joins", "pointers",
+}
+
+# Skill names that are also common words ("react quickly", "backend team"). They only
+# match in their capitalized spelling ("React", "Rails") and count as low-confidence
+# matches, which do not decide whether LLM skill extraction can be skipped.
+CASE_SENSITIVE_TERMS = {
+    "react", "agile", "bootstrap", "rails", "backend", "frontend", "analytics", "assembly", "expo",
+    "spark", "unity", "jest", "dart", "bash", "gin", "maven", "oracle", "devise", "looker",
+    "transformers", "flask", "lambda",
+}
+
+def _usable(term):
+    return len(term) > 1 and term not in AMBIGUOUS_TERMS
+
+# Term (lowercase) → canonical skill, from SKILL_SYNONYMS plus extra vocabulary
+# such as the portfolio Techstack entries
+def build_vocabulary(extra_terms=()):
+    vocabulary = {}
+    for term, canonical in SKILL_SYNONYMS.items():
+        for key in (term, canonical.lower()):
+            if _usable(key):
+                vocabulary[key] = canonical
+    for term in extra_terms:
+        term = str(term).strip()
+        if _usable(term.lower()):
+            # Keep the portfolio's own spelling unless a synonym maps it
+            vocabulary.setdefault(term.lower(), SKILL_SYNONYMS.get(term.lower(), term))
+    return vocabulary
+
+def _is_word_char(ch):
+    return ch.isalnum()
+
+# Lowercased text with the same offsets as `text`. A few characters lowercase to two
+# ("İ" → "i̇"), which would shift every later offset; those are kept as they are
+# (no vocabulary term contains them).
+def _lower_aligned(text):
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    return "".join(low if len(low) == 1 else ch for ch, low in ((ch, ch.lower()) for ch in text))
+
+# Multi-pattern skill matcher (Aho-Corasick): one linear pass over the text finds
+# every vocabulary term; matches must sit on word boundaries, and overlapping
+# matches resolve to the leftmost-longest one ("react native" over "react").
+class SkillMatcher:
+    def __init__(self, vocabulary):
+        self.vocabulary = vocabulary
+        # Case-sensitive term → accepted spellings ("react" → {"React"})
+        self._spellings = {
+            term: {term.capitalize(), canonical} for term, canonical in vocabulary.items() if term in CASE_SENSITIVE_TERMS
+        }
+        if ahocorasick is not None:
+            self._automaton = ahocorasick.Automaton()
+            for term, canonical in vocabulary.items():
+                self._automaton.add_word(term, (len(term), canonical))
+            self._automaton.make_automaton()
+        else:
+            self._automaton = None
+            self._build(vocabulary)
+
+    # Pure-Python automaton: goto transitions, failure links and merged outputs
+    def _build(self, vocabulary):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        for term, canonical in vocabulary.items():
+            state = 0
+            for ch in term:
+                if ch not in self._goto[state]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                    self._goto[state][ch] = len(self._goto) - 1
+                state = self._goto[state][ch]
+            self._out[state].append((len(term), canonical))
+
+        queue = deque(self._goto[0].values())  # Depth-1 states fail to the root
+        while queue:
+            state = queue.popleft()
+            for ch, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(ch, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def _iter_raw(self, lowered):
+        if self._automaton is not None:
+            for end, (length, canonical) in self._automaton.iter(lowered):
+                yield end + 1 - length, end + 1, canonical
+            return
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for index, ch in enumerate(lowered):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for length, canonical in out[state]:
+                yield index + 1 - length, index + 1, canonical
+
+    # (start, end, canonical) for every non-overlapping, word-bounded match
+    def find(self, text):
+        lowered = _lower_aligned(text)
+        size = len(lowered)
+        spellings = self._spellings
+        candidates = [
+            (start, end, canonical) for start, end, canonical in self._iter_raw(lowered)
+            if (start == 0 or not _is_word_char(lowered[start - 1]))
+            and (end == size or not _is_word_char(lowered[end]))
+            and (lowered[start:end] not in spellings or text[start:end] in spellings[lowered[start:end]])
+        ]
+        candidates.sort(key=lambda match: (match[0], match[0] - match[1]))
+        matches = []
+        last_end = -1
+        for start, end, canonical in candidates:
+            if start >= last_end:
+                matches.append((start, end, canonical))
+                last_end = end
+        return matches
+
+    # Canonical skills in order of first appearance
+    def extract(self, text):
+        return list(dict.fromkeys(canonical for _, _, canonical in self.find(text)))
+
+    # Skills in order of first appearance, plus the high-confidence ones among them
+    # (found at least once through a term that is not also a common word)
+    def extract_with_confidence(self, text):
+        skills, confident = {}, {}
+        for start, end, canonical in self.find(text):
+            skills[canonical] = True
+            if text[start:end].lower() not in self._spellings:
+                confident[canonical] = True
+        return {"skills": list(skills), "confident": list(confident)}
@@ -1,4 +1,5 @@
 import re
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
 
 # Skill synonyms mapping for normalization
 SKILL_SYNONYMS = {
@@ -166,20 +167,109 @@ SKILL_SYNONYMS = {
     "vulnerability assessment": "Vulnerability Assessment",
 }
 
+# Section headings that signal job-posting content (shared by HTML parsing and page readiness)
+JOB_SECTION_KEYWORDS = r"(Qualifications|Requirements|Experience|Responsibilities)"
+
+# Query parameters that only track the click and never change the page
+TRACKING_PARAMS = {"gclid", "fbclid", "msclkid", "mc_cid", "mc_eid"}
+
+# Normalize a URL for cache/dedup keys: lowercase scheme and host, drop default
+# ports, fragments and tracking parameters, and sort the remaining query string
+def normalize_url(url: str) -> str:
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower() or "https"
+    host = (parts.hostname or "").lower()
+    if parts.port and (scheme, parts.port) not in (("http", 80), ("https", 443)):
+        host = f"{host}:{parts.port}"
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in TRACKING_PARAMS
+    )
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((scheme, host, path, urlencode(query), ""))
+
+# Referral/source parameters job boards and ATSs append to posting links. They can
+# select a different landing page on general sites, so only canonical_job_url drops them.
+JOB_REFERRAL_PARAMS = {"gh_src", "lever-source", "lever-origin", "source", "src", "ref", "referrer", "trk", "refid", "trackingid"}
+
+# ATS posting URLs → stable posting identity, matched against "host/path?query".
+# The same posting is reachable through company career sites, embeds and board
+# mirrors; the ATS job id is what stays the same.
+ATS_URL_PATTERNS = [
+    ("greenhouse", re.compile(r"greenhouse\.io/.*?(?:jobs/|[?&]token=)(\d+)")),
+    ("greenhouse", re.compile(r"[?&]gh_jid=(\d+)")),
+    ("lever", re.compile(r"jobs\.(?:eu\.)?lever\.co/[^/]+/([0-9a-f-]{36})")),
+    ("ashby", re.compile(r"jobs\.ashbyhq\.com/[^/]+/([0-9a-f-]{36})")),
+    ("smartrecruiters", re.compile(r"smartrecruiters\.com/[^/]+/(\d+)")),
+    ("workday", re.compile(r"([a-z0-9-]+)\.wd\d+\.myworkdayjobs\.com/.*/job/[^?]*_([A-Za-z0-9-]+)(?:\?|$)")),
+]
+
+# Canonical identity of a job posting for duplicate detection: an `ats://<ats>/<id>`
+# key for known ATS URLs, else the normalized URL without "www.", scheme differences,
+# referral parameters or a trailing /apply
+def canonical_job_url(url: str) -> str:
+    normalized = normalize_url(url)
+    parts = urlsplit(normalized)
+    target = f"{parts.netloc}{parts.path}" + (f"?{parts.query}" if parts.query else "")
+    for ats, pattern in ATS_URL_PATTERNS:
+        match = pattern.search(target)
+        if match:
+            return f"ats://{ats}/" + "/".join(g.lower() for g in match.groups())
+    host = parts.netloc[4:] if parts.netloc.startswith("www.") else parts.netloc
+    path = re.sub(r"/(?:apply|application)$", "", parts.path) or "/"
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k.lower() not in JOB_REFERRAL_PARAMS]
+    return urlunsplit(("https", host, path, urlencode(query), ""))
+
+# Characters per token assumed when no tokenizer is available (English prose)
+CHARS_PER_TOKEN = 4
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except ImportError:  # Optional: fall back to the character heuristic
+    _encoding = None
+
+# Token count for budgeting LLM calls (tiktoken when installed, else ~4 chars/token)
+def estimate_tokens(text: str) -> int:
+    if _encoding is not None:
+        return max(1, len(_encoding.encode(text, disallowed_special=())))
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+# Split text into chunks of roughly `max_tokens` with `overlap_tokens` of shared
+# context between neighbours, breaking on whitespace where possible
+def split_into_chunks(text: str, max_tokens: int, overlap_tokens: int = 0) -> list:
+    size = max_tokens * CHARS_PER_TOKEN
+    overlap = min(overlap_tokens * CHARS_PER_TOKEN, size // 2)
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + size, len(text))
+        if end < len(text):
+            space = text.rfind(" ", start + size // 2, end)
+            end = space if space != -1 else end
+        chunks.append(text[start:end].strip())
+        if end >= len(text):
+            break
+        start = end - overlap
+    return [chunk for chunk in chunks if chunk]
+
 # Normalize skill name to its canonical form using SKILL_SYNONYMS mapping
 def normalize_skill(skill: str) -> str:
     skill_clean = skill.strip().lower()  # Clean and lowercase input
     return SKILL_SYNONYMS.get(skill_clean, skill.title())  # Return normalized or title-cased input
 
+# Pre-compiled cleaning patterns. Tags go first (only when the text has any), then one
+# pass drops URLs and non-alphanumeric runs; URLs win at each position, which gives the
+# same result as running the two substitutions one after the other.
+HTML_TAG_RE = re.compile(r'<[^>]*?>')
+URL_OR_SYMBOL_RE = re.compile(r'https?://\S+|[^a-zA-Z0-9 ]+')
+
 # Clean raw text by removing unwanted characters and formatting
 def clean_text(text: str) -> str:
     # Remove any HTML tags
-    text = re.sub(r'<[^>]*?>', '', text)
-    # Remove URLs
-    text = re.sub(r'https?://\S+', '', text)
-    # Remove non-alphanumeric characters (but keep spaces)
-    text = re.sub(r'[^a-zA-Z0-9 ]+', '', text)
-    # Normalize multiple spaces to a single space
-    text = re.sub(r'\s+', ' ', text)
-    # Trim whitespace from both ends
-    return text.strip()
\ No newline at end of file
+    if "<" in text:
+        text = HTML_TAG_RE.sub('', text)
+    # Remove URLs and non-alphanumeric characters (but keep spaces)
+    text = URL_OR_SYMBOL_RE.sub('', text)
+    # Normalize multiple spaces to a single space and trim both ends
+    return " ".join(text.split())
@@ -0,0 +1,97 @@
+# Accuracy check and micro-benchmark for near-duplicate detection (app/dedup.py).
+# Uses the synthetic fixture postings, which share a company template (the same
+# filler paragraphs on every page) like real careers sites do:
+#
+#   - every distinct posting must NOT match the others (no template merges)
+#   - a lightly edited repost of each posting must match its original
+#
+# then times fingerprinting and lookups. Exits with status 1 on any wrong match.
+#
+#   python benchmarks/bench_dedup.py [--postings 40] [--kb 20]
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "app"))
+sys.path.insert(0, BENCH_DIR)
+
+from dedup import DuplicateIndex
+from fixture_server import static_page, synthetic_posting
+from preprocessing import prepare_page
+
+# Two roles on one company template: shared "About us" prose and benefits list
+ABOUT = " ".join(["Acme builds software for logistics teams around the world and has offices in five countries."] * 12)
+BENEFITS = "".join(f"<li>{b}</li>" for b in [
+    "Flexible remote work with quarterly team offsites in Lisbon",
+    "Learning budget for courses, books and conference travel every year",
+    "Private health insurance for you and your family members",
+])
+TEMPLATE_PAIR = [
+    f"<h1>Python Engineer</h1><p>{ABOUT}</p><h2>Requirements</h2><ul>"
+    "<li>5+ years building Python services with Django and PostgreSQL</li>"
+    "<li>Experience operating APIs on AWS with Docker and Kubernetes</li></ul>"
+    f"<h2>Benefits</h2><ul>{BENEFITS}</ul>",
+    f"<h1>Frontend Developer</h1><p>{ABOUT}</p><h2>Requirements</h2><ul>"
+    "<li>3+ years building web applications with React and TypeScript</li>"
+    "<li>Experience with design systems, accessibility and GraphQL clients</li></ul>"
+    f"<h2>Benefits</h2><ul>{BENEFITS}</ul>",
+]
+
+# The same posting republished: a word in its requirements changed and a closing line added
+def repost(body):
+    return body.replace("reliability", "resilience", 1) + "<p>Applications are reviewed on a rolling basis.</p>"
+
+def prepared(body, name):
+    page = prepare_page(static_page(body, name))
+    return page["posting_text"], page["title"]
+
+def main():
+    parser = argparse.ArgumentParser(description="Near-duplicate detection accuracy and speed.")
+    parser.add_argument("--postings", type=int, default=40, help="Synthetic postings to index")
+    parser.add_argument("--kb", type=int, default=20, help="Approximate size of each synthetic posting")
+    args = parser.parse_args()
+
+    index = DuplicateIndex(path=os.path.join(tempfile.mkdtemp(prefix="dedup_"), "dedup.sqlite3"))
+    bodies = [synthetic_posting(i, args.kb) for i in range(args.postings)]
+    pages = [prepared(body, f"job{i}") for i, body in enumerate(bodies)]
+    failures = []
+
+    # Distinct postings: each is looked up before it is added, so any hit is a false merge
+    ids = []
+    start = time.perf_counter()
+    for i, (text, title) in enumerate(pages):
+        match = index.lookup_text(text, title)
+        if match is not None:
+            failures.append(f"job{i} matched {match['url']} (similarity {match['similarity']})")
+        ids.append(index.add(f"https://example.com/jobs/{i}", text, [{"role": title}], title))
+    add_seconds = time.perf_counter() - start
+
+    # Reposts must find their original
+    start = time.perf_counter()
+    for i, body in enumerate(bodies):
+        text, title = prepared(repost(body), f"repost{i}")
+        match = index.lookup_text(text, title)
+        if match is None or match["id"] != ids[i]:
+            failures.append(f"repost of job{i} → {match and match['url']}")
+    repost_seconds = time.perf_counter() - start
+
+    # Shared company template, different roles
+    pair = [prepared(body, "acme") for body in TEMPLATE_PAIR]
+    (text, title), other = pair
+    index.add("https://acme.example/jobs/python-engineer", text, [{"role": title}], title)
+    match = index.lookup_text(*other)
+    if match is not None:
+        failures.append(f"Frontend Developer matched Python Engineer (similarity {match['similarity']})")
+
+    print(f"{args.postings} postings: add+lookup {add_seconds / args.postings * 1000:.2f} ms, "
+          f"repost lookup {repost_seconds / args.postings * 1000:.2f} ms each (incl. parsing)")
+    if failures:
+        print("❌ Wrong duplicate decisions:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+    print(f"✅ No false merges across {args.postings} templated postings; all {args.postings} reposts matched")
+
+if __name__ == "__main__":
+    main()
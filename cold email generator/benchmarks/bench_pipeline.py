@@ -0,0 +1,260 @@
+# Offline end-to-end benchmark: no network, no Groq.
+# Serves job-page fixtures from a local HTTP server, swaps ChatGroq for the
+# deterministic FakeChatModel, and runs the pipeline two ways:
+#
+#   single  the app's path, one URL at a time (fetch_page_sync → prepare_page →
+#           extraction → retrieval → write_mail)
+#   batch   the concurrent BatchPipeline used by app/batch.py
+#
+# Reports end-to-end p50/p95 and throughput plus per-stage latency (from the
+# metrics tracer; parse-process spawn time is reported as `startup_seconds` and
+# kept out of the throughput figures) as JSON under benchmarks/results/<commit>.json. Compare against an
+# earlier report to catch regressions:
+#
+#   python benchmarks/bench_pipeline.py --urls 20 --llm-latency 0.05
+#   python benchmarks/bench_pipeline.py --compare benchmarks/results/abc1234.json
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "app"))
+sys.path.insert(0, BENCH_DIR)
+
+from batch import MIN_LOCAL_SKILLS, PORTFOLIO_TOP_K, BatchPipeline
+from browser_pool import shutdown_browser_pool
+from chains import Chain
+from fake_llm import FakeChatModel
+from fetcher import close_http_client, fetch_page_sync
+from fixture_server import FixtureServer
+from llm_client import AsyncChain
+from metrics import percentile
+from parse_pool import ParsePool
+from portfolio import Portfolio
+from preprocessing import prepare_page
+from skill_matcher import SkillMatcher, build_vocabulary
+
+PORTFOLIO_CSV = os.path.join(BENCH_DIR, "..", "app", "resource", "company_portfolio.csv")
+
+def latency_stats(values):
+    return {
+        "p50": round(percentile(values, 0.50), 4),
+        "p95": round(percentile(values, 0.95), 4),
+        "max": round(max(values, default=0.0), 4),
+    }
+
+# --- Modes ---
+
+# The Streamlit app's path without the UI, one URL after another
+def run_single(urls, chain, portfolio, skill_matcher):
+    tracer = chain.tracer
+    latencies, errors = [], 0
+    for url in urls:
+        start = time.perf_counter()
+        try:
+            fetched = fetch_page_sync(url)
+            prepared = prepare_page(fetched["content"], skill_matcher=skill_matcher)
+            tracer.record_timings(prepared["timings"])
+            if len(prepared["confident_skills"]) >= MIN_LOCAL_SKILLS:
+                jobs = chain.extract_role_summary(prepared["cleaned_text"], prepared["local_skills"])
+            else:
+                jobs = chain.extract_and_summarize(prepared["cleaned_text"])
+            for job in jobs:
+                with tracer.span("retrieval", mode="lexical"):
+                    links = [link["links"] for link in portfolio.query_links(job.get("skills", []), top_k=PORTFOLIO_TOP_K)]
+                chain.write_mail(job, links, url)
+        except Exception as e:
+            errors += 1
+            print(f"⚠️ {url}: {type(e).__name__}: {e}", file=sys.stderr)
+            continue
+        latencies.append(time.perf_counter() - start)
+    return latencies, errors
+
+# The batch CLI's concurrent pipeline
+def run_batch(urls, chain, portfolio, skill_matcher, args):
+    records = []
+    startup = 0.0
+
+    async def run():
+        nonlocal startup
+        parse_pool = None
+        if args.parse_processes:
+            # Same vocabulary as the thread path (and app/batch.py), so both do the same work
+            parse_pool = ParsePool(workers=args.parse_processes, vocabulary=skill_matcher.vocabulary)
+            startup = await parse_pool.start()
+        pipeline = BatchPipeline(
+            AsyncChain(chain, max_concurrency=args.llm_concurrency, per_model_concurrency=args.llm_concurrency,
+                       requests_per_minute=10 ** 6, tokens_per_minute=10 ** 9),
+            portfolio,
+            skill_matcher=skill_matcher,
+            fetch_concurrency=args.fetch_concurrency,
+            parse_pool=parse_pool,
+        )
+        try:
+            await pipeline.run(urls, records.append)
+        finally:
+            await close_http_client()
+            if parse_pool is not None:
+                parse_pool.close()
+
+    asyncio.run(run())
+    # A URL's end-to-end latency is that of its last finished job
+    per_url = defaultdict(float)
+    errors = 0
+    for record in records:
+        if record["status"] == "error":
+            errors += 1
+            print(f"⚠️ {record['url']}: {record['error']}", file=sys.stderr)
+        elif "elapsed" in record:
+            per_url[record["url"]] = max(per_url[record["url"]], record["elapsed"])
+    return list(per_url.values()), errors, startup
+
+def run_mode(mode, urls, chain, portfolio, skill_matcher, args):
+    tracer = chain.tracer
+    tracer.reset()
+    start = time.perf_counter()
+    startup = 0.0
+    if mode == "single":
+        latencies, errors = run_single(urls, chain, portfolio, skill_matcher)
+    else:
+        latencies, errors, startup = run_batch(urls, chain, portfolio, skill_matcher, args)
+    # Steady-state wall time: parse worker spawning is reported on its own
+    wall = time.perf_counter() - start - startup
+    report = tracer.report(recent_spans=0)
+    stages = {
+        name: {k: stats[k] for k in ("count", "p50", "p95", "max")} | {"per_minute": round(stats["count"] / wall * 60, 1)}
+        for name, stats in report["stages"].items()
+    }
+    return {
+        "urls": len(urls),
+        "errors": errors,
+        "startup_seconds": round(startup, 3),
+        "wall_seconds": round(wall, 3),
+        "urls_per_minute": round(len(latencies) / wall * 60, 1),
+        "end_to_end": latency_stats(latencies),
+        "stages": stages,
+        "llm": report["llm"],
+    }
+
+# --- Reporting ---
+
+def git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True, cwd=BENCH_DIR).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True, cwd=BENCH_DIR).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+
+def print_results(results):
+    for mode, result in results.items():
+        e2e = result["end_to_end"]
+        print(f"\n[{mode}] {result['urls']} URLs in {result['wall_seconds']:.2f}s — {result['urls_per_minute']:.0f} URLs/min, "
+              f"p50 {e2e['p50']:.3f}s, p95 {e2e['p95']:.3f}s, {result['errors']} errors")
+        if result.get("startup_seconds"):
+            print(f"  parse pool startup {result['startup_seconds']:.2f}s (not included above)")
+        for name, stats in result["stages"].items():
+            print(f"  {name:<12} n={stats['count']:<5} p50 {stats['p50']:.4f}s  p95 {stats['p95']:.4f}s  {stats['per_minute']:>9.1f}/min")
+
+# Print p50/p95/throughput changes against a baseline report; returns the metrics
+# whose p95 (or throughput) got worse by more than `threshold`
+def compare(results, baseline, threshold):
+    regressions = []
+    print(f"\nComparison with {baseline['commit']} (regression threshold {threshold:.0%}):")
+    for mode, result in results.items():
+        old = baseline["results"].get(mode)
+        if old is None:
+            continue
+        rows = [("end_to_end", result["end_to_end"], old["end_to_end"])]
+        rows += [(name, stats, old["stages"][name]) for name, stats in result["stages"].items() if name in old["stages"]]
+        for name, new_stats, old_stats in rows:
+            for key in ("p50", "p95"):
+                before, after = old_stats[key], new_stats[key]
+                change = (after - before) / before if before else 0.0
+                print(f"  [{mode}] {name:<12} {key} {before:.4f}s → {after:.4f}s ({change:+.0%})")
+                if key == "p95" and change > threshold and after - before > 0.001:
+                    regressions.append(f"{mode}/{name} p95 {change:+.0%}")
+        before, after = old["urls_per_minute"], result["urls_per_minute"]
+        change = (after - before) / before if before else 0.0
+        print(f"  [{mode}] throughput {before:.0f} → {after:.0f} URLs/min ({change:+.0%})")
+        if change < -threshold:
+            regressions.append(f"{mode} throughput {change:+.0%}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end pipeline benchmark.")
+    parser.add_argument("--urls", type=int, default=20, help="Synthetic fixture pages to serve")
+    parser.add_argument("--fixtures", default=None, help="Directory of recorded *.html job pages (instead of synthetic)")
+    parser.add_argument("--kb", type=int, default=20, help="Approximate size of each synthetic posting")
+    parser.add_argument("--variant", choices=["static", "js"], default="static", help="js pages need the browser tier")
+    parser.add_argument("--modes", default="single,batch", help="Comma-separated: single, batch")
+    parser.add_argument("--server-latency", type=float, default=0.02, help="Fixture server delay per request (s)")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Fake model time to first token (s)")
+    parser.add_argument("--llm-seconds-per-token", type=float, default=0.001, help="Fake model generation time per token (s)")
+    parser.add_argument("--llm-tokens", type=int, default=120, help="Fake model output length")
+    parser.add_argument("--fetch-concurrency", type=int, default=8)
+    parser.add_argument("--llm-concurrency", type=int, default=4)
+    parser.add_argument("--parse-processes", type=int, default=0, help="Batch parse worker processes (0 = threads)")
+    parser.add_argument("--out", default=None, help="Report path (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", default=None, help="Baseline report to compare against")
+    parser.add_argument("--threshold", type=float, default=0.20, help="Relative p95/throughput change counted as a regression")
+    args = parser.parse_args()
+
+    server = FixtureServer(fixtures_dir=args.fixtures, count=args.urls, kb=args.kb, latency=args.server_latency).start()
+    urls = server.urls(args.variant)
+    model = FakeChatModel(latency=args.llm_latency, seconds_per_token=args.llm_seconds_per_token, completion_tokens=args.llm_tokens)
+    # No response cache, so every run pays for the same (fake) LLM work
+    chain = Chain(prompt_mode="robust", combined_extraction=True, llm=model, cache=None)
+    # Portfolio opens a ChromaDB store under ./vectorstore; keep it out of the repo
+    os.chdir(tempfile.mkdtemp(prefix="bench_"))
+    portfolio = Portfolio(file_path=PORTFOLIO_CSV)
+    skill_matcher = SkillMatcher(build_vocabulary(portfolio.techstack_terms))
+
+    results = {}
+    try:
+        for mode in [m.strip() for m in args.modes.split(",") if m.strip()]:
+            results[mode] = run_mode(mode, urls, chain, portfolio, skill_matcher, args)
+    finally:
+        shutdown_browser_pool()
+        server.close()
+
+    commit, dirty = git_commit()
+    report = {
+        "commit": commit + ("-dirty" if dirty else ""),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": vars(args),
+        "results": results,
+    }
+    print_results(results)
+    out = args.out or os.path.join(BENCH_DIR, "results", f"{report['commit']}.json")
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport written to {out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        # Numbers are only comparable for the same workload
+        ignored = {"out", "compare", "threshold"}
+        changed = sorted(k for k, v in vars(args).items() if k not in ignored and baseline["config"].get(k) != v)
+        if changed:
+            print(f"⚠️ Baseline was run with different settings: {', '.join(changed)}")
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print("❌ Regressions: " + ", ".join(regressions))
+            sys.exit(1)
+        print("✅ No regressions")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# Micro-benchmark for text preprocessing on large pages.
+# Compares the original multi-pass clean_text / extract_experience_years with the
+# pre-compiled implementations and checks that they agree.
+#
+#   python benchmarks/bench_preprocessing.py [--pages 20] [--kb 500]
+import argparse
+import os
+import random
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from preprocessing import extract_experience_years
+from utils import clean_text
+
+# --- Original implementations (baseline) ---
+
+def legacy_clean_text(text):
+    text = re.sub(r'<[^>]*?>', '', text)
+    text = re.sub(r'https?://\S+', '', text)
+    text = re.sub(r'[^a-zA-Z0-9 ]+', '', text)
+    text = re.sub(r'\s+', ' ', text)
+    return text.strip()
+
+def legacy_extract_experience_years(text):
+    patterns = [
+        r"(\d+)\+?\s*(?:years?|yrs?)\s+of\s+[\w\s]+experience"
+        r"(\d+)\+?\s*(?:years?|yrs?)\s+(?:of\s+)?(?:.*?\s)?experience",
+        r"minimum\s+of\s+(\d+)\+?\s*(?:years?|yrs?)",
+        r"(?:typically|around|approximately)?\s*(\d+)\+?\s*(?:years?|yrs?)\b",
+        r"experience.*?(\d+)\+?\s*(?:years?|yrs?)",
+        r"(\d+)\+?\s*(?:years?|yrs?)\s+technical",
+        r"(\d+)\+?\s*(?:years?|yrs?)\s+in\s+.*",
+    ]
+    found_years = []
+    for pattern in patterns:
+        matches = re.findall(pattern, text, re.IGNORECASE)
+        found_years.extend([int(m) for m in matches if isinstance(m, str) and m.isdigit()])
+    return f"{max(found_years)} years" if found_years else "Not specified"
+
+# --- Synthetic pages ---
+
+SNIPPETS = [
+    "Responsibilities", "Design and build scalable services in Python, Go and Kubernetes.",
+    "Minimum of 3 years of professional experience.", "5+ years of experience in backend engineering",
+    "Visit https://careers.example.com/jobs/12345?utm_source=feed for details!", "Benefits: 401(k), PTO & more...",
+    "Experience with AWS, GCP or Azure; typically 7 yrs in a similar role.", "© 2025 Example Corp. All rights reserved.",
+    "<b>Qualifications</b>", "Cookies help us deliver our services — accept?",
+]
+
+def make_page(kb, seed):
+    rng = random.Random(seed)
+    lines = []
+    size = 0
+    while size < kb * 1024:
+        line = rng.choice(SNIPPETS)
+        lines.append(line)
+        size += len(line) + 1
+    return "\n".join(lines)
+
+def bench(label, fn, pages, repeat):
+    best = min(timeit.repeat(lambda: [fn(p) for p in pages], number=1, repeat=repeat))
+    mb = sum(len(p) for p in pages) / 1e6
+    print(f"{label:<34} {best * 1000:9.1f} ms   {mb / best:8.1f} MB/s")
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark text preprocessing on large pages.")
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--kb", type=int, default=500, help="Approximate size of each page")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    pages = [make_page(args.kb, seed) for seed in range(args.pages)]
+    for page in pages:
+        assert clean_text(page) == legacy_clean_text(page), "clean_text output changed"
+        assert extract_experience_years(page) == legacy_extract_experience_years(page), "experience output changed"
+
+    print(f"{args.pages} pages x ~{args.kb} KB")
+    old = bench("clean_text (legacy, 5 passes)", legacy_clean_text, pages, args.repeat)
+    new = bench("clean_text (compiled)", clean_text, pages, args.repeat)
+    print(f"{'':<34} {old / new:9.1f}x faster")
+    old = bench("experience (legacy, 7 regexes)", legacy_extract_experience_years, pages, args.repeat)
+    new = bench("experience (single scan)", extract_experience_years, pages, args.repeat)
+    print(f"{'':<34} {old / new:9.1f}x faster")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# Deterministic stand-in for ChatGroq used by the offline benchmarks.
+# Responses depend only on the prompt: extraction prompts (they ask for JSON) get a
+# job object built from the roles/skills found in the page text, every other prompt
+# gets plain text. Latency is a fixed time-to-first-token plus a per-token generation
+# time, so runs are repeatable and cost nothing.
+import json
+import re
+import time
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from fixture_server import ROLES, SKILLS
+from utils import estimate_tokens
+
+WORDS = ("reliable scalable platform delivery engineering teams cloud services data quality "
+         "partnership outcomes experience modern architecture secure").split()
+
+class FakeChatModel(BaseChatModel):
+    latency: float = 0.05  # Seconds before the first token
+    seconds_per_token: float = 0.002  # Generation time per output token
+    completion_tokens: int = 120  # Output tokens per response (approximate)
+
+    @property
+    def _llm_type(self):
+        return "fake-benchmark"
+
+    def _respond(self, prompt):
+        if "JSON" in prompt:
+            page = prompt.split("### INSTRUCTION", 1)[0]
+            role = next((r for r in ROLES if r in page), "Software Engineer")
+            years = re.search(r"(\d+)\+?\s*years", page)
+            job = {
+                "role": role,
+                "experience": f"{years.group(1)} years" if years else "",
+                "skills": [s for s in SKILLS if re.search(rf"\b{re.escape(s)}\b", page)],
+                "description": f"{role} building production systems.",
+                "summary": " ".join(WORDS[i % len(WORDS)] for i in range(self.completion_tokens // 2)),
+            }
+            return json.dumps(job)
+        body = " ".join(WORDS[i % len(WORDS)] for i in range(self.completion_tokens))
+        return f"Subject: Engineering support for your team\n\nDear Hiring Manager,\n\n{body}\n\nBest regards,\nKarthik"
+
+    def _usage(self, prompt, content):
+        input_tokens, output_tokens = estimate_tokens(prompt), estimate_tokens(content)
+        return {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        prompt = "\n".join(str(m.content) for m in messages)
+        content = self._respond(prompt)
+        usage = self._usage(prompt, content)
+        time.sleep(self.latency + usage["output_tokens"] * self.seconds_per_token)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content, usage_metadata=usage))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        prompt = "\n".join(str(m.content) for m in messages)
+        content = self._respond(prompt)
+        time.sleep(self.latency)
+        pieces = re.findall(r"\S+\s*|\s+", content)
+        for piece in pieces:
+            time.sleep(estimate_tokens(piece) * self.seconds_per_token)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=piece))
+        # Usage arrives on the final chunk, as with streamed provider responses
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=self._usage(prompt, content)))
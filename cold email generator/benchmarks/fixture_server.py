@@ -0,0 +1,153 @@
+# Local HTML fixture server for offline benchmarks.
+# Serves job pages from a directory of recorded fixtures (*.html) or, when none is
+# given, deterministic synthetic postings. Every page is available in two variants:
+#
+#   /static/<name>  server-rendered HTML (handled by the static HTTP tier)
+#   /js/<name>      an empty shell whose posting is injected by JavaScript after a
+#                   short delay (fails the static job-content check → browser tier)
+#
+#   python benchmarks/fixture_server.py --port 8765 [--fixtures DIR] [--latency 0.05]
+import argparse
+import html
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROLES = ["Senior Python Engineer", "Data Engineer", "Frontend Developer", "DevOps Engineer", "ML Engineer"]
+SKILLS = ["Python", "Django", "React", "Kubernetes", "AWS", "PostgreSQL", "Docker", "Kafka", "TypeScript",
+          "Terraform", "Spark", "Node.js", "Redis", "GraphQL", "Java", "Machine Learning"]
+FILLER = [
+    "You will work with product and design to ship features used by millions of customers.",
+    "Our platform team owns the services, pipelines and tooling behind every release.",
+    "We value ownership, clear written communication and pragmatic engineering decisions.",
+    "The role partners with data science to bring models from prototype to production.",
+    "Expect code review, mentoring and on-call shared fairly across the team.",
+]
+
+# Page chrome the extractor is expected to strip
+CHROME = """
+<header class="site-header"><nav><a href="/">Home</a> <a href="/jobs">Jobs</a> <a href="/about">About</a></nav></header>
+<div class="cookie-banner">We use cookies to improve your experience. <button>Accept</button></div>
+"""
+FOOTER = """
+<aside class="similar-jobs"><h3>Similar jobs</h3><ul><li><a href="/j/1">QA Engineer</a></li><li><a href="/j/2">Support Engineer</a></li></ul></aside>
+<footer class="footer">© Example Corp · Privacy · Terms</footer>
+"""
+
+# Deterministic synthetic posting body (roughly `kb` kilobytes) for fixture `index`
+def synthetic_posting(index, kb=20):
+    rng = random.Random(index)
+    role = ROLES[index % len(ROLES)]
+    skills = rng.sample(SKILLS, 6)
+    parts = [
+        f"<h1>{role}</h1>",
+        "<h2>Responsibilities</h2><ul>",
+        *(f"<li>Build and operate services with {a} and {b}, with a focus on reliability and performance.</li>"
+          for a, b in zip(skills[::2], skills[1::2])),
+        "</ul><h2>Qualifications</h2><ul>",
+        f"<li>{rng.randint(2, 8)}+ years of experience in software engineering.</li>",
+        f"<li>Hands-on experience with {', '.join(skills)}.</li></ul>",
+    ]
+    size = sum(len(p) for p in parts)
+    while size < kb * 1024:
+        paragraph = f"<p>{rng.choice(FILLER)} {rng.choice(FILLER)}</p>"
+        parts.append(paragraph)
+        size += len(paragraph)
+    return "\n".join(parts)
+
+def static_page(body, title):
+    return f"<html><head><title>{html.escape(title)}</title></head><body>{CHROME}<main>{body}</main>{FOOTER}</body></html>"
+
+def js_page(body, title, delay_ms=300):
+    return (
+        f"<html><head><title>{html.escape(title)}</title></head><body>{CHROME}<main id='app'>Loading…</main>{FOOTER}"
+        f"<script>setTimeout(function () {{ document.getElementById('app').innerHTML = {json.dumps(body)}; }}, {delay_ms});</script>"
+        "</body></html>"
+    )
+
+# Fixture bodies by name: the recorded pages in `fixtures_dir`, else `count` synthetic ones
+def load_fixtures(fixtures_dir=None, count=20, kb=20):
+    if fixtures_dir:
+        fixtures = {}
+        for name in sorted(os.listdir(fixtures_dir)):
+            if name.endswith(".html"):
+                with open(os.path.join(fixtures_dir, name), encoding="utf-8") as f:
+                    fixtures[name] = f.read()
+        return fixtures, True
+    return {f"job{index}.html": synthetic_posting(index, kb) for index in range(count)}, False
+
+# Threaded fixture server. Recorded fixtures are served as-is on /static/ (and with
+# their <body> injected by script on /js/); `latency` adds a fixed delay per request.
+class FixtureServer:
+    def __init__(self, port=0, fixtures_dir=None, count=20, kb=20, latency=0.0, js_delay_ms=300):
+        fixtures, recorded = load_fixtures(fixtures_dir, count, kb)
+        self.names = list(fixtures)
+        pages = {}
+        for name, content in fixtures.items():
+            body = content if not recorded else content.split("<body", 1)[-1].split(">", 1)[-1].rsplit("</body>", 1)[0]
+            pages[f"/static/{name}"] = content if recorded else static_page(body, name)
+            pages[f"/js/{name}"] = js_page(body, name, js_delay_ms)
+        self.pages = {path: page.encode("utf-8") for path, page in pages.items()}
+        self.latency = latency
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep-alive, like real job boards
+
+            def do_GET(self):
+                server.requests += 1
+                if server.latency:
+                    time.sleep(server.latency)
+                body = server.pages.get(self.path.split("?")[0])
+                if body is None:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def urls(self, variant="static"):
+        return [f"http://127.0.0.1:{self.port}/{variant}/{name}" for name in self.names]
+
+    def close(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve job-page fixtures for offline benchmarks.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fixtures", default=None, help="Directory of recorded *.html job pages")
+    parser.add_argument("--count", type=int, default=20, help="Synthetic pages when no fixtures are given")
+    parser.add_argument("--kb", type=int, default=20, help="Approximate size of each synthetic posting")
+    parser.add_argument("--latency", type=float, default=0.0, help="Added delay per request (seconds)")
+    args = parser.parse_args()
+
+    server = FixtureServer(args.port, args.fixtures, args.count, args.kb, args.latency).start()
+    for url in server.urls("static")[:3] + server.urls("js")[:3]:
+        print(url)
+    print(f"Serving {len(server.names)} fixtures on port {server.port} (Ctrl+C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.close()
+
+if __name__ == "__main__":
+    main()